@@ -0,0 +1,262 @@
+"""
+Synthetic large show benchmarks
+
+Builds shows of many RGB lights driven by chases, pulses, effects and
+spawners, steps them as fast as possible and reports frames per second,
+per-frame latency percentiles and peak memory. Each benchmark runs in its own
+process so peak memory is measured separately.
+
+    python benchmarks/large_show.py
+    python benchmarks/large_show.py --sizes 1000 --frames 100 chase twinkle
+"""
+from __future__ import division
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+
+from birdfish import tween
+from birdfish.effects import ColorShift, Pulser, Twinkle
+from birdfish.lights import Chase, HitPulse, LightShow, PulseChase, RGBLight
+from birdfish.log_setup import logger
+from birdfish.output.base import BaseNetwork
+from birdfish.scheduler import monotonic
+
+# whole RGB lights in a 512 channel universe
+LIGHTS_PER_UNIVERSE = 170
+
+
+class BenchmarkNetwork(BaseNetwork):
+    """
+    A network that renders its frames, but sends them nowhere
+    """
+
+    def transmit(self):
+        pass
+
+
+def build_lights(show, count, engine=False):
+    if engine:
+        from birdfish.engine import ArrayEngine, EngineRGBLight
+        show.engine = ArrayEngine(capacity=count)
+    lights = []
+    network = None
+    for i in range(count):
+        if i % LIGHTS_PER_UNIVERSE == 0:
+            network = BenchmarkNetwork()
+            show.networks.append(network)
+        kwargs = dict(start_channel=(i % LIGHTS_PER_UNIVERSE) * 3 + 1,
+                name='light_%s' % i, attack_duration=.1, decay_duration=.1,
+                sustain_value=.8, release_duration=.3)
+        if engine:
+            light = EngineRGBLight(engine=show.engine, **kwargs)
+        else:
+            light = RGBLight(**kwargs)
+        light.hue = random.random()
+        light.saturation = 1
+        network.add_element(light)
+        lights.append(light)
+    return lights
+
+
+def rgb(show, lights):
+    """every light triggered on and off in waves"""
+    for light in lights:
+        show.add_element(light)
+
+    def frame(i):
+        # a tenth of the lights change each frame
+        step = len(lights) // 10
+        start = (i % 10) * step
+        for light in lights[start:start + step]:
+            light.trigger(0 if light.trigger_state else 1)
+    return frame
+
+
+def chase(show, lights):
+    """a looping sweep over all the lights"""
+    c = Chase(name='chase', start_pos=0, end_pos=len(lights), speed=2)
+    c.elements = lights
+    c.continuation_mode = 'loop'
+    show.add_element(c)
+    c.trigger(1)
+
+
+def chase_window(show, lights):
+    """a looping chase lighting a ten light window"""
+    c = Chase(name='chase', start_pos=0, end_pos=len(lights), speed=2)
+    c.elements = lights
+    c.sweep = False
+    c.width = 10
+    c.continuation_mode = 'loop'
+    show.add_element(c)
+    c.trigger(1)
+
+
+def pulse_chase(show, lights):
+    """a pulse bouncing along all the lights"""
+    p = PulseChase(name='pulse', start_pos=0, end_pos=len(lights) - 1,
+            speed=2, left_width=10, right_width=10,
+            left_shape=tween.OUT_CIRC, right_shape=tween.OUT_CIRC)
+    p.elements = lights
+    show.add_element(p)
+    p.trigger(1)
+
+
+def twinkle(show, lights):
+    """lights twinkling in groups of ten"""
+    # as in the twinkle examples, the lights are in the show so each twinkle
+    # runs their envelopes
+    for light in lights:
+        show.add_element(light)
+    for i in range(0, len(lights), 10):
+        t = Twinkle(targets=lights[i:i + 10])
+        show.effects.append(t)
+        t.trigger(1)
+
+
+def pulser(show, lights):
+    """lights pulsing in groups of a hundred"""
+    for light in lights:
+        light.intensity = 1
+    for i in range(0, len(lights), 100):
+        p = Pulser(frequency=2, targets=lights[i:i + 100])
+        show.effects.append(p)
+        p.trigger(1)
+
+
+def color_shift(show, lights):
+    """lights cycling hue in groups of a hundred"""
+    for i in range(0, len(lights), 100):
+        shift = ColorShift(targets=lights[i:i + 100])
+        shift.add_hue_shift(0, 1, 2)
+        shift.add_intensity_shift(1, .5, 1)
+        shift.add_intensity_shift(.5, 1, 1)
+        show.effects.append(shift)
+        shift.trigger(1)
+
+
+def hit_pulse(show, lights):
+    """bursts spawned at random positions, each released after half a
+    second"""
+    width = 8
+    spawner = HitPulse(name='hits')
+    spawner.elements = lights
+    spawner.width = width
+    spawner.show = show
+    spawner.network = show.networks[-1]
+    show.add_element(spawner)
+    held = []
+
+    def frame(i):
+        key = random.randint(width, len(lights) - width)
+        spawner.trigger(1, key=(0, key))
+        held.append(key)
+        if len(held) > 20:
+            spawner.trigger(0, key=(0, held.pop(0)))
+    return frame
+
+
+SCENARIOS = [rgb, chase, chase_window, pulse_chase, twinkle, pulser,
+        color_shift, hit_pulse]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def peak_memory():
+    """peak resident memory of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on Mac OS X
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run(scenario, size, frames, engine=False):
+    random.seed(size)
+    show = LightShow()
+    start = monotonic()
+    lights = build_lights(show, size, engine)
+    frame = scenario(show, lights)
+    show.init_show()
+    build = monotonic() - start
+    times = []
+    for i in range(frames):
+        start = monotonic()
+        if frame:
+            frame(i)
+        show.step(speed=0)
+        times.append(monotonic() - start)
+    total = sum(times)
+    return {
+            'scenario': scenario.__name__,
+            'lights': size,
+            'build': build,
+            'fps': frames / total if total else 0,
+            'p50': percentile(times, 50),
+            'p90': percentile(times, 90),
+            'p99': percentile(times, 99),
+            'max': max(times),
+            'memory': peak_memory(),
+            }
+
+
+def _run_in_process(results, *args):
+    results.put(run(*args))
+
+
+def run_isolated(*args):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_in_process,
+            args=(results,) + args)
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+HEADER = '%-14s %7s %8s %9s %9s %9s %9s %9s %8s' % ('scenario', 'lights',
+        'build s', 'fps', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'peak MB')
+
+
+def format_result(r):
+    return '%-14s %7d %8.2f %9.1f %9.2f %9.2f %9.2f %9.2f %8.1f' % (
+            r['scenario'], r['lights'], r['build'], r['fps'],
+            r['p50'] * 1000, r['p90'] * 1000, r['p99'] * 1000,
+            r['max'] * 1000, r['memory'])
+
+
+def main(argv=None):
+    names = [s.__name__ for s in SCENARIOS]
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('scenarios', nargs='*',
+            help='scenarios to run, all by default: %s' % ', '.join(names))
+    parser.add_argument('--sizes', default='1000,10000,50000',
+            help='comma separated numbers of lights')
+    parser.add_argument('--frames', type=int, default=200,
+            help='frames to step each show')
+    parser.add_argument('--engine', action='store_true',
+            help='use array engine lights, requires NumPy')
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios).difference(names)
+    if unknown:
+        parser.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+    # the show's info logging is not part of the benchmark
+    logger.setLevel('WARNING')
+    scenarios = [s for s in SCENARIOS
+            if not args.scenarios or s.__name__ in args.scenarios]
+    print(HEADER)
+    for size in [int(s) for s in args.sizes.split(',')]:
+        for scenario in scenarios:
+            result = run_isolated(scenario, size, args.frames, args.engine)
+            print(format_result(result))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,866 @@
+"""
+Array backed render engine
+
+The regular light classes each carry their own envelope tree and color state,
+and are updated one at a time by the show. For shows with thousands of lights
+that per object work dominates the frame.
+
+The ArrayEngine keeps intensity, color, trigger and ADSR state for many lights
+in NumPy arrays, one row per light, and advances all of them with a handful of
+batched operations per frame. EngineRGBLight is a drop in RGBLight whose
+attributes are views onto its row in the engine.
+
+Usage::
+
+    show = LightShow()
+    show.engine = ArrayEngine()
+    light = EngineRGBLight(engine=show.engine, start_channel=1)
+
+numpy is only needed when this module is used.
+"""
+from __future__ import division
+from copy import deepcopy
+import copy_reg
+from functools import partial
+from types import MemberDescriptorType
+import weakref
+
+import numpy as np
+
+from birdfish import tween
+from birdfish.lights import RGBDevice, RGBLight
+from birdfish.utils import OrderedSet
+
+# phases of the ADSR state machine
+IDLE, ATTACK, DECAY, SUSTAIN, RELEASE = range(5)
+
+# the labels the object envelopes report for each phase, an idle envelope
+# sits at the start of its attack segment
+PHASE_LABELS = ('attack', 'attack', 'decay', 'sustain', 'release')
+
+# tweens that only use arithmetic operators and so can be given arrays
+# directly, others are interpolated from their tween tables
+ARRAY_TWEENS = set([
+    tween.STATIC,
+    tween.LINEAR,
+    tween.IN_QUAD,
+    tween.OUT_QUAD,
+    tween.IN_CUBIC,
+    tween.OUT_CUBIC,
+    tween.IN_QUART,
+    tween.OUT_QUART,
+    tween.IN_BACK,
+    tween.OUT_BACK,
+    ])
+
+
+def evaluate_tween(func, t, b, c, d):
+    """
+    Evaluate a tween over arrays of time, start, change and duration.
+
+    Rows with a duration of 0 take their end value, as EnvelopeSegment does.
+    """
+    if not len(t):
+        return t
+    zero = d <= 0
+    if zero.any():
+        d = np.where(zero, 1.0, d)
+    if func in ARRAY_TWEENS:
+        values = func(t, b, c, d)
+    elif func not in tween.CHANGE_DEPENDENT:
+        # other curves are interpolated from their tables in one pass
+        lut = tween.table(func)
+        values = b + c * np.interp(t / d,
+                np.linspace(0, 1, len(lut.values)), lut.values)
+    else:
+        values = np.array([func(*args) for args in zip(t, b, c, d)],
+                dtype=float)
+    if zero.any():
+        values = np.where(zero, b + c, values)
+    return values
+
+
+def hsv_to_rgb(h, s, v):
+    """
+    Vectorized colorsys.hsv_to_rgb, returns a tuple of red, green and blue
+    arrays.
+    """
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(int) % 6
+    r = np.choose(i, (v, q, p, p, t, v))
+    g = np.choose(i, (t, v, v, q, p, p))
+    b = np.choose(i, (p, p, t, v, v, q))
+    return r, g, b
+
+
+class _Rows(object):
+    """
+    Growable arrays of fields, one row per item.
+    """
+
+    float_fields = ()
+    int_fields = ()
+    counter_fields = ()
+    bool_fields = ()
+
+    def _grow(self, capacity):
+        for fields, dtype in ((self.float_fields, float),
+                (self.int_fields, np.int16),
+                (self.counter_fields, np.int64),
+                (self.bool_fields, bool)):
+            for field in fields:
+                new = np.zeros(capacity, dtype=dtype)
+                if self.capacity:
+                    new[:self.capacity] = getattr(self, field)
+                setattr(self, field, new)
+        self.capacity = capacity
+
+    @property
+    def fields(self):
+        return (self.float_fields + self.int_fields + self.counter_fields +
+                self.bool_fields)
+
+    def clear_row(self, row):
+        for field in self.fields:
+            getattr(self, field)[row] = 0
+
+    def copy_row(self, source, target):
+        for field in self.fields:
+            values = getattr(self, field)
+            values[target] = values[source]
+
+
+class EnvelopeBank(_Rows):
+    """
+    The ADSR state and parameters of many envelopes in arrays, advanced
+    together.
+
+    Each row holds an envelope's phase, trigger state, elapsed time and value,
+    along with its peak, sustain, durations and shapes. advance steps every
+    active row at once, carrying overage from one segment into the next, and
+    releases jump to the current value as a TriggeredEnvelope's do.
+
+    A bank can stand in for the envelopes of regular light elements, see
+    attach, and is then set as the show's engine so it is advanced each
+    frame. An ArrayEngine keeps the envelopes of its lights in a bank.
+    """
+
+    float_fields = (
+            'value',
+            'elapsed',
+            'peak',
+            'sustain',
+            'attack_duration',
+            'decay_duration',
+            'release_duration',
+            )
+
+    int_fields = (
+            'phase',
+            'state',
+            'attack_shape',
+            'decay_shape',
+            'release_shape',
+            )
+
+    def __init__(self, capacity=256):
+        self.capacity = 0
+        # number of rows in use, including freed rows waiting for reuse
+        self.size = 0
+        self.free_rows = []
+        # weak references to the envelopes that own their rows, by row
+        self._owners = {}
+        self.tweens = []
+        self.tween_ids = {}
+        self._completed = np.zeros(0, dtype=int)
+        self._grow(max(1, capacity))
+
+    def tween_id(self, func):
+        if func not in self.tween_ids:
+            self.tween_ids[func] = len(self.tweens)
+            self.tweens.append(func)
+        return self.tween_ids[func]
+
+    def allocate(self):
+        """
+        Reserve a row, returns the row index.
+        """
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow(self.capacity * 2)
+            row = self.size
+            self.size += 1
+        self.clear_row(row)
+        return row
+
+    def free(self, row):
+        """
+        Return a row to the bank for reuse.
+        """
+        self._owners.pop(row, None)
+        self.phase[row] = IDLE
+        self.free_rows.append(row)
+
+    def own(self, envelope):
+        """
+        Free the row of a BankEnvelope once the envelope is no longer
+        referenced, or is freed itself.
+        """
+        self._owners[envelope.row] = weakref.ref(envelope,
+                partial(self._dropped, envelope.row))
+
+    def free_envelope(self, envelope):
+        """
+        Free the row of an envelope the bank owns, rows of other envelopes are
+        left alone.
+        """
+        owner = self._owners.get(envelope.row)
+        if owner is not None and owner() is envelope:
+            self.free(envelope.row)
+
+    def _dropped(self, row, ref):
+        if self._owners.get(row) is ref:
+            self.free(row)
+
+    def load(self, row, envelope):
+        """
+        Copy the parameters of an ADSREnvelope or CompiledADSREnvelope into a
+        row.
+        """
+        attack, decay, sustain, release = envelope.profiles()
+        self.peak[row] = attack.start + attack.change
+        self.attack_duration[row] = attack.duration
+        self.attack_shape[row] = self.tween_id(attack.tween)
+        self.sustain[row] = sustain.start
+        if decay:
+            self.decay_duration[row] = decay.duration
+            self.decay_shape[row] = self.tween_id(decay.tween)
+        else:
+            self.decay_duration[row] = 0
+            self.decay_shape[row] = self.tween_id(tween.LINEAR)
+        self.release_duration[row] = release.duration
+        self.release_shape[row] = self.tween_id(release.tween)
+
+    def attach(self, element):
+        """
+        Move the envelope of a light element into a row of the bank, the
+        element's adsr_envelope becomes a view onto the row. The row is freed
+        for reuse when the element is dropped.
+        """
+        envelope = element.adsr_envelope
+        if isinstance(envelope, BankEnvelope) and envelope.bank is self:
+            return envelope.row
+        row = self.allocate()
+        self.load(row, envelope)
+        element.adsr_envelope = BankEnvelope(self, row)
+        self.own(element.adsr_envelope)
+        return row
+
+    def trigger(self, row, state=1, force=False):
+        """
+        The TriggeredEnvelope state change for a single row.
+        """
+        if force:
+            self.state[row] = not state
+        if self.state[row] != state:
+            if state:
+                self.phase[row] = ATTACK
+                self.elapsed[row] = 0
+                self.value[row] = 0
+            else:
+                self._release(row)
+        self.state[row] = state
+
+    def _release(self, row):
+        self.phase[row] = RELEASE
+        self.elapsed[row] = 0
+        sustain = self.sustain[row]
+        duration = self.release_duration[row]
+        value = self.value[row]
+        if value < sustain and duration > 0:
+            # start the release from the current value, rather than jump up
+            # to the sustain level
+            func = self.tweens[self.release_shape[row]]
+            jump = tween.jump_time(func, value, sustain, -sustain, duration)
+            self.elapsed[row] = jump
+            self.value[row] = func(min(jump, duration), sustain, -sustain,
+                    duration)
+
+    def _segment_values(self, rows, shapes, t, b, c, d):
+        values = np.empty(len(rows))
+        shape_ids = shapes[rows]
+        for shape_id in np.unique(shape_ids):
+            mask = shape_ids == shape_id
+            values[mask] = evaluate_tween(self.tweens[shape_id],
+                    np.minimum(t[mask], d[mask]), b[mask], c[mask], d[mask])
+        return values
+
+    def advance(self, time_delta, active=None):
+        """
+        Advance the active rows, all rows that are not idle by default, and
+        return the rows whose release completed during this step. Those rows
+        are left in release, for the caller to make idle.
+        """
+        n = self.size
+        phase = self.phase[:n]
+        if active is None:
+            active = phase != IDLE
+        elapsed = self.elapsed[:n]
+        elapsed[active] += time_delta
+        # carry any overage from one segment into the next
+        for current, durations, following in (
+                (ATTACK, self.attack_duration, DECAY),
+                (DECAY, self.decay_duration, SUSTAIN)):
+            over = active & (phase == current) & (elapsed > durations[:n])
+            elapsed[over] -= durations[:n][over]
+            phase[over] = following
+
+        value = self.value[:n]
+        peak = self.peak[:n]
+        sustain = self.sustain[:n]
+        rows = np.flatnonzero(active & (phase == ATTACK))
+        if len(rows):
+            value[rows] = self._segment_values(rows, self.attack_shape,
+                    elapsed[rows], np.zeros(len(rows)), peak[rows],
+                    self.attack_duration[rows])
+        rows = np.flatnonzero(active & (phase == DECAY))
+        if len(rows):
+            value[rows] = self._segment_values(rows, self.decay_shape,
+                    elapsed[rows], peak[rows], sustain[rows] - peak[rows],
+                    self.decay_duration[rows])
+        rows = active & (phase == SUSTAIN)
+        value[rows] = sustain[rows]
+        rows = np.flatnonzero(active & (phase == RELEASE))
+        if len(rows):
+            value[rows] = self._segment_values(rows, self.release_shape,
+                    elapsed[rows], sustain[rows], -sustain[rows],
+                    self.release_duration[rows])
+
+        return np.flatnonzero(active & (phase == RELEASE) &
+                (elapsed > self.release_duration[:n]))
+
+    def update(self, show):
+        # as with the object envelopes, a completed release still reports
+        # advancing until the frame after, so elements take its final value
+        completed = self._completed
+        if len(completed):
+            done = ((self.phase[completed] == RELEASE) &
+                    (self.elapsed[completed] >
+                        self.release_duration[completed]))
+            self.phase[completed[done]] = IDLE
+        self._completed = self.advance(show.time_delta)
+
+
+class ArrayEngine(_Rows):
+    """
+    Holds the state of many lights in arrays and advances them together.
+
+    Rows are allocated as lights are created, and grow the arrays as needed.
+    The envelopes of the lights are kept in an EnvelopeBank, with the same
+    rows. The show calls update once per frame before updating its elements.
+    """
+
+    float_fields = (
+            'intensity',
+            'trigger_intensity',
+            'hue',
+            'saturation',
+            'red',
+            'green',
+            'blue',
+            'rendered_hue',
+            'rendered_saturation',
+            'rendered_value',
+            )
+
+    int_fields = (
+            'trigger_state',
+            )
+
+    # the device generation, see PhysicalDevice.generation
+    counter_fields = (
+            'generation',
+            )
+
+    bool_fields = (
+            'bell_mode',
+            'simple',
+            'normalize',
+            'full_intensity',
+            )
+
+    def __init__(self, capacity=256):
+        self.capacity = 0
+        self.lights = []
+        self.envelopes = EnvelopeBank(capacity)
+        self._grow(self.envelopes.capacity)
+        # the writer of this engine's devices on each network
+        self._frame_rows = weakref.WeakKeyDictionary()
+
+    @property
+    def size(self):
+        return self.envelopes.size
+
+    def allocate(self, light):
+        """
+        Reserve a row for a light, returns the row index.
+        """
+        # rows are allocated by the envelope bank
+        row = self.envelopes.allocate()
+        if self.envelopes.capacity > self.capacity:
+            self._grow(self.envelopes.capacity)
+        if row == len(self.lights):
+            self.lights.append(light)
+        else:
+            self.lights[row] = light
+        self.clear_row(row)
+        return row
+
+    def free(self, light):
+        """
+        Return a light's row to the engine for reuse.
+        """
+        row = light.row
+        if self.lights[row] is light:
+            self.lights[row] = None
+            self.trigger_intensity[row] = 0
+            self.envelopes.free(row)
+
+    def frame_rows(self, network):
+        """
+        The FrameRows writing this engine's devices into a network's frame
+        """
+        if network not in self._frame_rows:
+            self._frame_rows[network] = FrameRows(self)
+        return self._frame_rows[network]
+
+    def load_envelope(self, row, envelope):
+        self.envelopes.load(row, envelope)
+
+    def copy_row(self, source, target):
+        super(ArrayEngine, self).copy_row(source, target)
+        self.envelopes.copy_row(source, target)
+
+    def update_envelopes(self, time_delta):
+        """
+        Advance every triggered row, returns the rows whose release completed
+        during this step.
+        """
+        n = self.size
+        phase = self.envelopes.phase[:n]
+        active = ((phase != IDLE) & (self.trigger_intensity[:n] != 0) &
+                ~self.simple[:n])
+        # bell mode ignores trigger off - simulate trigger off once sustain
+        # levels are reached, without advancing for this frame
+        bell = active & self.bell_mode[:n] & ((phase == DECAY) |
+                (phase == SUSTAIN))
+        if bell.any():
+            for row in np.flatnonzero(bell):
+                self.lights[row].bell_reset()
+            active &= ~bell
+
+        completed = self.envelopes.advance(time_delta, active)
+        value = self.envelopes.value[:n]
+        intensity = self.intensity[:n]
+        trigger_intensity = self.trigger_intensity[:n]
+        rows = np.flatnonzero(active)
+        new = trigger_intensity[rows] * value[rows]
+        # only rows whose intensity changed, not those held in sustain, need
+        # their channels written again
+        self.generation[rows[new != intensity[rows]]] += 1
+        intensity[rows] = new
+        phase[completed] = IDLE
+        trigger_intensity[completed] = 0
+        return completed
+
+    def color_value(self, rows):
+        """
+        The hsv value used for the RGB conversion of the given rows.
+        """
+        intensity = np.where(self.full_intensity[rows], 1.0,
+                self.intensity[rows])
+        normalize = self.normalize[rows] & (intensity > 0)
+        if normalize.any():
+            # matches RGBLight, which rescales by the brightest channel
+            intensity = np.where(normalize, intensity * intensity, intensity)
+        return intensity
+
+    def update_color(self, rows=None):
+        """
+        Convert hue, saturation and intensity to RGB for the given rows, or
+        for all rows whose inputs changed since their last conversion.
+        """
+        if rows is None:
+            n = self.size
+            value = self.color_value(slice(0, n))
+            changed = ((value != self.rendered_value[:n]) |
+                    (self.hue[:n] != self.rendered_hue[:n]) |
+                    (self.saturation[:n] != self.rendered_saturation[:n]))
+            rows = np.flatnonzero(changed)
+            if not len(rows):
+                return
+            value = value[rows]
+        else:
+            rows = np.asarray(rows)
+            value = self.color_value(rows)
+        hue = self.hue[rows]
+        saturation = self.saturation[rows]
+        r, g, b = hsv_to_rgb(hue, saturation, value)
+        self.red[rows] = r
+        self.green[rows] = g
+        self.blue[rows] = b
+        self.rendered_hue[rows] = hue
+        self.rendered_saturation[rows] = saturation
+        self.rendered_value[rows] = value
+        self.generation[rows] += 1
+
+    def update(self, show):
+        completed = self.update_envelopes(show.time_delta)
+        self.update_color()
+        for row in completed:
+            # only turn off effects here so they can continue to effect
+            # releases
+            [x.trigger(0) for x in self.lights[row].effects]
+
+
+class FrameRows(object):
+    """
+    Writes the channels of an engine's devices on one network straight from
+    the engine's arrays into the network's frame.
+
+    The frame offsets of the devices, and the engine rows and fields their
+    values come from, are compiled into arrays whenever devices are added or
+    removed. Each frame only the channels of rows whose generation changed
+    are written, channels shared with other devices are merged highest value
+    wins.
+    """
+
+    fields = ('intensity', 'red', 'green', 'blue')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.devices = OrderedSet()
+        self._compiled = False
+        self._frame = None
+        self._view = None
+
+    def __len__(self):
+        return len(self.devices)
+
+    def add(self, device):
+        self.devices.add(device)
+        self._compiled = False
+
+    def discard(self, device):
+        self.devices.discard(device)
+        self._compiled = False
+
+    def reset(self):
+        """
+        Write every device again on the next frame
+        """
+        self._compiled = False
+
+    def _compile(self, network):
+        devices = list(self.devices)
+        self.device_rows = np.array([d.row for d in devices], dtype=int)
+        # the generation of each device when it was last written
+        self.generations = np.zeros(len(devices), dtype=np.int64) - 1
+        offsets = []
+        entry_devices = []
+        groups = {}
+        for index, device in enumerate(devices):
+            for offset, field in zip(device.channel_offsets,
+                    device.channel_attributes):
+                gamma = device.gamma if field == 'intensity' else None
+                group = groups.setdefault((field, id(gamma)),
+                        (field, gamma, [], []))
+                group[2].append(len(offsets))
+                group[3].append(device.row)
+                offsets.append(offset)
+                entry_devices.append(index)
+        self.offsets = np.array(offsets, dtype=int)
+        self.entry_devices = np.array(entry_devices, dtype=int)
+        self.groups = []
+        for field, gamma, entries, rows in groups.values():
+            if gamma:
+                # gamma as the 8 bit lookup PhysicalDevice.update_data uses
+                gamma = np.array([gamma[i] for i in range(256)]) / 255
+            self.groups.append((field, gamma, np.array(entries, dtype=int),
+                np.array(rows, dtype=int)))
+        # channels also written by the network's other devices
+        self.shared = np.array([bool(network._offset_devices.get(o))
+            for o in offsets], dtype=bool)
+        self.any_shared = self.shared.any()
+        self.overlap = self.any_shared or (
+                len(np.unique(self.offsets)) != len(offsets))
+        self._compiled = True
+
+    def changed_offsets(self, network):
+        """
+        The offsets shared with other devices of the network whose engine
+        values changed, to be cleared and merged again by the network
+        """
+        if not self._compiled:
+            self._compile(network)
+        self._current = self.engine.generation[self.device_rows]
+        self._changed = self._current != self.generations
+        if not self.any_shared:
+            return ()
+        return self.offsets[self._changed[self.entry_devices] &
+                self.shared].tolist()
+
+    def _values(self, entries):
+        # the values of the selected entries, as offsets and values
+        engine = self.engine
+        offsets = []
+        values = []
+        for field, gamma, group_entries, rows in self.groups:
+            selected = entries[group_entries]
+            if not selected.any():
+                continue
+            group_values = getattr(engine, field)[rows[selected]]
+            if gamma is not None:
+                group_values = gamma[np.clip((group_values * 255).astype(int),
+                    0, 255)]
+            offsets.append(self.offsets[group_entries[selected]])
+            values.append(group_values)
+        # as the per-device merge, an overshooting tween leaves the frame at 0
+        return np.concatenate(offsets), np.maximum(np.concatenate(values), 0)
+
+    def write(self, network, vacated):
+        """
+        Write the channels of changed rows, and any channels on the vacated
+        offsets the network has cleared, into the network's frame. Returns
+        the offsets written.
+        """
+        entries = self._changed[self.entry_devices]
+        if vacated:
+            entries |= np.in1d(self.offsets, list(vacated))
+        self.generations = self._current
+        if not entries.any():
+            return ()
+        if network.frame is not self._frame:
+            self._frame = network.frame
+            self._view = np.frombuffer(network.frame, dtype=np.float32)
+        frame = self._view
+        if self.overlap:
+            # every entry on the offsets written is merged again
+            entries = np.in1d(self.offsets, self.offsets[entries])
+            frame[self.offsets[entries & ~self.shared]] = 0
+            offsets, values = self._values(entries)
+            np.maximum.at(frame, offsets, values)
+        else:
+            offsets, values = self._values(entries)
+            frame[offsets] = values
+        return offsets.tolist()
+
+
+def _copy_attributes(source, target, memo, skip=()):
+    """
+    Deep copy the attributes of source to target, both those in slots and
+    those in its __dict__.
+    """
+    cls = type(source)
+    for name in copy_reg._slotnames(cls):
+        # slots overridden by row properties are copied with the row
+        if (name not in skip and hasattr(source, name) and
+                isinstance(getattr(cls, name), MemberDescriptorType)):
+            setattr(target, name, deepcopy(getattr(source, name), memo))
+    for key, value in source.__dict__.items():
+        if key not in skip:
+            target.__dict__[key] = deepcopy(value, memo)
+
+
+def _row_property(field, owner='engine'):
+    def getter(self):
+        return getattr(getattr(self, owner), field)[self.row]
+
+    def setter(self, value):
+        getattr(getattr(self, owner), field)[self.row] = value
+
+    return property(getter, setter)
+
+
+class BankEnvelope(object):
+    """
+    Stands in for an ADSREnvelope, with the state stored in a row of an
+    EnvelopeBank.
+    """
+
+    def __init__(self, bank, row):
+        self.bank = bank
+        self.row = row
+
+    def __deepcopy__(self, memo):
+        # copies share the bank, each with its own row
+        row = self.bank.allocate()
+        self.bank.copy_row(self.row, row)
+        new = self.__class__(self.bank, row)
+        self.bank.own(new)
+        memo[id(self)] = new
+        return new
+
+    def free(self):
+        """
+        Give back the row of a copied or attached envelope, the envelope must
+        not be used after.
+        """
+        self.bank.free_envelope(self)
+
+    def trigger(self, state=1, value=1.0, force=False):
+        if value == 0:
+            state = 0
+        self.bank.trigger(self.row, state=state, force=force)
+
+    def update(self, delta):
+        # the bank advances all rows at once, before elements are updated
+        return self.value
+
+    def reset(self):
+        self.bank.phase[self.row] = IDLE
+        self.bank.elapsed[self.row] = 0
+        self.bank.value[self.row] = 0
+
+    def get_current_segment(self):
+        return self
+
+    @property
+    def label(self):
+        return PHASE_LABELS[self.bank.phase[self.row]]
+
+    @property
+    def advancing(self):
+        return self.bank.phase[self.row] != IDLE
+
+    @property
+    def attack_completed(self):
+        return self.bank.phase[self.row] in (DECAY, SUSTAIN)
+
+    value = _row_property('value', 'bank')
+    state = _row_property('state', 'bank')
+
+
+class EngineRGBDevice(RGBDevice):
+    """
+    An RGBDevice whose channel values are read from an engine row.
+    """
+
+    def __init__(self, engine, row, *args, **kwargs):
+        self.engine = engine
+        self.row = row
+        super(EngineRGBDevice, self).__init__(*args, **kwargs)
+
+    def compile_channels(self):
+        super(EngineRGBDevice, self).compile_channels()
+        # as RGBLight, color is at full value when intensity has a channel
+        self.engine.full_intensity[self.row] = (
+                'intensity' in self.channel_attributes)
+
+    def update_channels(self):
+        # color is converted by the engine for all its rows at once
+        pass
+
+    def frame_rows(self, network):
+        """
+        The engine writes the channels of its devices on a network, unless
+        they are patched to attributes it does not hold
+        """
+        if set(self.channel_attributes).issubset(FrameRows.fields):
+            return self.engine.frame_rows(network)
+        return None
+
+    intensity = _row_property('intensity')
+    red = _row_property('red')
+    green = _row_property('green')
+    blue = _row_property('blue')
+    generation = _row_property('generation')
+
+
+class EngineRGBLight(RGBLight):
+    """
+    An RGBLight whose intensity, color, trigger and envelope state live in a
+    row of an ArrayEngine.
+
+    The engine advances the envelope and color of these lights, so they do not
+    need to be added to the show's elements unless they carry effects.
+    """
+
+    def __init__(self, engine=None, *args, **kwargs):
+        if engine is None:
+            raise ValueError("EngineRGBLight requires an engine")
+        self.engine = engine
+        self.row = engine.allocate(self)
+        device = EngineRGBDevice(engine, self.row, *args, **kwargs)
+        super(EngineRGBLight, self).__init__(device, *args, **kwargs)
+        self.full_intensity = 'intensity' in self.device.channels.values()
+        engine.load_envelope(self.row, self.adsr_envelope)
+        self.adsr_envelope = BankEnvelope(engine.envelopes, self.row)
+
+    def __deepcopy__(self, memo):
+        # copies share the engine, each with its own row
+        cls = self.__class__
+        new = cls.__new__(cls)
+        memo[id(self)] = new
+        new.engine = self.engine
+        new.row = self.engine.allocate(new)
+        self.engine.copy_row(self.row, new.row)
+        _copy_attributes(self, new, memo,
+                skip=('engine', 'row', 'device', 'adsr_envelope'))
+        device = EngineRGBDevice.__new__(EngineRGBDevice)
+        device.engine = self.engine
+        device.row = new.row
+        _copy_attributes(self.device, device, memo, skip=('engine', 'row'))
+        new.device = device
+        new.adsr_envelope = BankEnvelope(self.engine.envelopes, new.row)
+        return new
+
+    @property
+    def needs_update(self):
+        # envelope and color are advanced by the engine, only effects are
+        # left to update
+        return bool(self.effects)
+
+    def free(self):
+        self.engine.free(self)
+
+    def update(self, show):
+        # envelope and color are advanced by the engine
+        for effect in self.effects:
+            effect.update(show, [self])
+        return self.intensity
+
+    def update_rgb(self):
+        self.engine.update_color([self.row])
+
+    def update_hue(self):
+        super(EngineRGBLight, self).update_hue()
+        self.hue = self._hue
+        self.saturation = self._saturation
+
+    def set_intensity(self, intensity):
+        if intensity != self.engine.intensity[self.row]:
+            self.engine.intensity[self.row] = intensity
+            self.engine.generation[self.row] += 1
+
+    def get_intensity(self):
+        return self.engine.intensity[self.row]
+
+    intensity = property(get_intensity, set_intensity)
+    trigger_intensity = _row_property('trigger_intensity')
+    trigger_state = _row_property('trigger_state')
+    bell_mode = _row_property('bell_mode')
+    simple = _row_property('simple')
+    normalize = _row_property('normalize')
+    full_intensity = _row_property('full_intensity')
+    hue = _row_property('hue')
+    saturation = _row_property('saturation')
+    red = _row_property('red')
+    green = _row_property('green')
+    blue = _row_property('blue')
@@ -1,4 +1,6 @@
+from copy import copy, deepcopy
 import warnings
+import weakref
 
 import tween
 from birdfish.log_setup import logger
@@ -39,8 +41,26 @@ class EnvelopeProfile(object):
     This is factored out from the segment so that one profile can be used
     across multiple segments/envelopes - as envelope instances are ultimately
     tied 1:1 with light elements.
+
+    Curves in tween.TABLE_TWEENS are evaluated from a shared lookup table,
+    unless use_tables is False.
+
+    Profiles from the profile_registry are shared, and are not copied by
+    deepcopy.
     """
 
+    # the envelope classes keep their attributes in slots, but still have a
+    # __dict__ for any others, which is only allocated when one is set
+    __slots__ = ('_tween', '_curve', '_jump_times', 'start', 'change',
+            'duration', 'label', 'shared', '__dict__', '__weakref__')
+
+    use_tables = True
+
+    # jump times are cached for values rounded to this step, and for at most
+    # max_jump_times values
+    jump_quantum = 1 / 1024.0
+    max_jump_times = 256
+
     def __init__(self, tween=tween.LINEAR, start=0, change=1.0, duration=1.0,
             label="profile"):
         self.tween = tween
@@ -48,18 +68,89 @@ class EnvelopeProfile(object):
         self.change = float(change)
         self.duration = float(duration)
         self.label = label
+        self.shared = False
 
         # assert self.duration > 0  # only a duration > 0 makes sense
 
+    def _get_tween(self):
+        return self._tween
+
+    def _set_tween(self, func):
+        self._tween = func
+        # created on the first jump
+        self._jump_times = None
+        if self.use_tables and func in tween.TABLE_TWEENS:
+            self._curve = tween.table(func).evaluate
+        else:
+            self._curve = func
+
+    tween = property(_get_tween, _set_tween)
+
+    def __deepcopy__(self, memo):
+        if self.shared:
+            return self
+        new = self.__class__(self._tween, self.start, self.change,
+                self.duration, self.label)
+        memo[id(self)] = new
+        extra = self.__dict__
+        if extra:
+            new.__dict__.update(deepcopy(extra, memo))
+        return new
+
     def get_value(self, delta):
         if delta > self.duration:
             delta = self.duration
         # as this class just provides the math - it does not store a value
-        return self.tween(delta, self.start, self.change, self.duration)
+        return self._curve(delta, self.start, self.change, self.duration)
 
     def get_jump_time(self, value):
-        return tween.jump_time(self.tween, value, self.start, self.change,
+        # the cache key includes the parameters as some elements change them
+        # in place between uses
+        step = int(round(value / self.jump_quantum))
+        key = (step, self.start, self.change, self.duration)
+        jump_times = self._jump_times
+        if jump_times is None:
+            jump_times = self._jump_times = {}
+        elif key in jump_times:
+            return jump_times[key]
+        if len(jump_times) >= self.max_jump_times:
+            jump_times.clear()
+        jump_times[key] = time = tween.jump_time(self._tween,
+                step * self.jump_quantum, self.start, self.change,
                 self.duration)
+        return time
+
+
+class ProfileRegistry(object):
+    """
+    Interns EnvelopeProfiles by tween and parameters
+
+    Envelopes with the same settings get the same profile, so the number of
+    profiles follows the number of distinct envelopes rather than the number
+    of lights. Profiles are held weakly, and dropped once no envelope uses
+    them. Interned profiles are shared, and must not be changed in place.
+    """
+
+    def __init__(self):
+        self.profiles = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def get(self, tween=tween.LINEAR, start=0, change=1.0, duration=1.0,
+            label="profile"):
+        key = (tween, float(start), float(change), float(duration), label)
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = EnvelopeProfile(tween, start, change, duration, label)
+            profile.shared = True
+            self.profiles[key] = profile
+        return profile
+
+profile_registry = ProfileRegistry()
+
+# the duration of a StaticEnvelopeSegment's profile
+STATIC_DURATION = 99999999999999999999999999999999.0
 
 
 class EnvelopeSegment(object):
@@ -67,6 +158,10 @@ class EnvelopeSegment(object):
     represents a segment of value change - has a reference to a profile that
     is used for calculations
     """
+
+    __slots__ = ('profile', 'label', 'elapsed', 'value', '__dict__',
+            '__weakref__')
+
     def __init__(self, tween=tween.LINEAR, start=0, change=1.0, duration=1.0,
             profile=None, label="segment"):
         if profile:
@@ -123,13 +218,16 @@ class StaticEnvelopeSegment(EnvelopeSegment):
     # just returns the start value unchanged - always
     # will never advance on its own without a trigger interving
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super(StaticEnvelopeSegment, self).__init__(*args, **kwargs)
-        self.profile.duration = 0
         # TODO - this is a hack so sustain doesn't get advanced over
         # as part of an on envelope that has no attack
         # can't use a neg value as flag - as it will mess with duration math
-        self.profile.duration = 99999999999999999999999999999999
+        # shared profiles are given this duration when they are made
+        if self.profile.duration != STATIC_DURATION:
+            self.profile.duration = STATIC_DURATION
 
     def update(self, delta):
         # always return the starting value
@@ -138,6 +236,10 @@ class StaticEnvelopeSegment(EnvelopeSegment):
 
 class Envelope(EnvelopeSegment):
 
+    __slots__ = ('segments', 'index', 'advancing', 'running', 'paused',
+            'pause_duration', 'loop', 'loop_counter', '_duration',
+            'current_segment_time_delta')
+
     def __init__(self, loop=0, label="envelope"):
         self.segments = []
         self.label = label
@@ -289,6 +391,8 @@ class Envelope(EnvelopeSegment):
 
 class TriggeredEnvelope(Envelope):
 
+    __slots__ = ('state',)
+
     def __init__(self, *args, **kwargs):
         super(TriggeredEnvelope, self).__init__(*args, **kwargs)
         self.state = 0  # on:1 off:0
@@ -372,7 +476,16 @@ class ADSREnvelope(TriggeredEnvelope):
             sustain (StaticEnvelopeSegment)
         off:
             release
+
+    The segment profiles come from the profile_registry, unless
+    intern_profiles is False.
     """
+
+    __slots__ = ('attack_envelope', 'on_envelope', 'decay_envelope',
+            'sustain_envelope', 'release_envelope', 'off_envelope')
+
+    intern_profiles = True
+
     def __init__(self,
             peak_value=1.0,
             sustain_value=0.8,
@@ -387,10 +500,13 @@ class ADSREnvelope(TriggeredEnvelope):
             **kwargs):
 
         super(ADSREnvelope, self).__init__(loop=0, label=label)
+        if self.intern_profiles:
+            profile = profile_registry.get
+        else:
+            profile = EnvelopeProfile
         self.attack_envelope = EnvelopeSegment(
-                tween=attack_shape,
-                change=peak_value,
-                duration=attack_duration,
+                profile=profile(attack_shape, 0, peak_value, attack_duration,
+                    "attack-profile"),
                 label="attack",
                 )
 
@@ -401,30 +517,169 @@ class ADSREnvelope(TriggeredEnvelope):
 
         if decay_change:
             self.decay_envelope = EnvelopeSegment(
-                    tween=decay_shape,
-                    start=peak_value,
-                    change=decay_change,
-                    duration=decay_duration,
+                    profile=profile(decay_shape, peak_value, decay_change,
+                        decay_duration, "decay-profile"),
                     label="decay",
                     )
             self.on_envelope.segments.append(self.decay_envelope)
         else:
             self.decay_envelope = None
 
-        self.sustain_envelope = StaticEnvelopeSegment(start=sustain_value,
+        self.sustain_envelope = StaticEnvelopeSegment(
+                profile=profile(tween.LINEAR, sustain_value, 1.0,
+                    STATIC_DURATION, "sustain-profile"),
                 label="sustain")
         self.on_envelope.segments.append(self.sustain_envelope)
         self.release_envelope = EnvelopeSegment(
-                tween=release_shape,
-                start=sustain_value,
-                change=0 - sustain_value,
-                duration=release_duration,
+                profile=profile(release_shape, sustain_value,
+                    0 - sustain_value, release_duration, "release-profile"),
                 label="release",
                 )
         self.off_envelope = Envelope(label="off-envelope")
         self.off_envelope.segments.append(self.release_envelope)
         self.segments = [self.on_envelope, self.off_envelope]
 
+    @property
+    def attack_completed(self):
+        return self.on_envelope.index == 1
+
+    def profiles(self):
+        """
+        The attack, decay, sustain and release profiles, decay may be None
+        """
+        decay = self.decay_envelope
+        return (self.attack_envelope.profile, decay and decay.profile,
+                self.sustain_envelope.profile, self.release_envelope.profile)
+
+
+class CompiledADSREnvelope(object):
+    """
+    An ADSR envelope compiled to a flat table of segment profiles
+
+    The table holds the attack, decay (if any), sustain and release profiles in
+    order, and is shared by copies of the envelope. The state of an envelope
+    is just the trigger state, the index of the current segment, the time
+    elapsed in it and the current value. It behaves as an ADSREnvelope does,
+    including the carry of overage into the next segment and the jump into
+    release from below the sustain value.
+
+    As with ADSREnvelope, the profiles come from the profile_registry unless
+    intern_profiles is False.
+    """
+
+    __slots__ = ('table', 'sustain_index', 'release_index', 'label', 'state',
+            'index', 'elapsed', 'value', 'advancing', '__dict__',
+            '__weakref__')
+
+    intern_profiles = True
+
+    def __init__(self,
+            peak_value=1.0,
+            sustain_value=0.8,
+            attack_shape=tween.LINEAR,
+            attack_duration=0.5,
+            decay_shape=tween.LINEAR,
+            decay_duration=.2,
+            release_shape=tween.LINEAR,
+            release_duration=.5,
+            bell_mode=False,
+            label='ADSR-envelope',
+            **kwargs):
+        if self.intern_profiles:
+            profile = profile_registry.get
+        else:
+            profile = EnvelopeProfile
+        table = [profile(attack_shape, 0, peak_value, attack_duration,
+            'attack')]
+        decay_change = -(peak_value - sustain_value)
+        if decay_change:
+            table.append(profile(decay_shape, peak_value, decay_change,
+                decay_duration, 'decay'))
+        table.append(profile(tween.LINEAR, sustain_value, 0, 0, 'sustain'))
+        table.append(profile(release_shape, sustain_value, 0 - sustain_value,
+            release_duration, 'release'))
+        self.table = tuple(table)
+        self.sustain_index = len(table) - 2
+        self.release_index = len(table) - 1
+        self.label = label
+        self.state = 0
+        self.reset()
+
+    def __deepcopy__(self, memo):
+        # only the state is copied, the table is shared
+        new = copy(self)
+        memo[id(self)] = new
+        return new
+
+    def reset(self):
+        self.index = 0
+        self.elapsed = 0
+        self.value = 0
+        self.advancing = True
+
+    def profiles(self):
+        """
+        The attack, decay, sustain and release profiles, decay may be None
+        """
+        table = self.table
+        decay = table[1] if self.sustain_index == 2 else None
+        return table[0], decay, table[-2], table[-1]
+
+    def get_current_segment(self):
+        # profiles carry the segment labels
+        return self.table[self.index]
+
+    def get_profile(self):
+        return self.table[self.index]
+
+    @property
+    def attack_completed(self):
+        return self.index == 1
+
+    def trigger(self, state=1, value=1.0, force=False):
+        if value == 0:
+            state = 0
+        if force:
+            self.state = not state
+        if self.state != state:
+            self.state = state
+            if state:
+                self.reset()
+            else:
+                if self.index == self.release_index:
+                    # a forced off trigger during release ends it
+                    self.advancing = False
+                else:
+                    self.index = self.release_index
+                    self.elapsed = 0
+                release = self.table[self.release_index]
+                if self.value < release.start:
+                    self.update(release.get_jump_time(self.value))
+        self.state = state
+
+    def update(self, delta):
+        index = self.index
+        if not (self.state or index or self.elapsed):
+            # not triggered, and at start
+            return self.value
+        self.elapsed += delta
+        profile = self.table[index]
+        if index == self.release_index:
+            if self.elapsed > profile.duration:
+                self.advancing = False
+        elif index != self.sustain_index and self.elapsed > profile.duration:
+            # carry the overage into the next segment of the on phase
+            self.elapsed -= profile.duration
+            index = self.index = index + 1
+            profile = self.table[index]
+        if index == self.sustain_index:
+            self.value = profile.start
+        elif not profile.duration:
+            self.value = profile.start + profile.change
+        else:
+            self.value = profile.get_value(self.elapsed)
+        return self.value
+
 
 class ColorEnvelope(object):
     """
@@ -3,24 +3,52 @@ from __future__ import division
 from collections import deque
 from copy import deepcopy
 import colorsys
-import warnings
 import time
 import math
+from operator import attrgetter
 import random
+import weakref
 import tween
-from envelope import ADSREnvelope, EnvelopeSegment
+from envelope import CompiledADSREnvelope, EnvelopeSegment
 # from scene import SceneManager
 from birdfish.colors import DIYC_DIM
 from birdfish.output.base import DefaultNetwork
+from birdfish.output.sender import OutputSender
+from birdfish.scheduler import FrameScheduler, JitterHistogram
+from birdfish.utils import NameIndex, OrderedSet
 
 from birdfish.log_setup import logger
 
 
+# compiled attribute getters, shared by all devices with the same channel
+# attributes - kept out of the devices themselves as getters can't be copied
+_channel_getters = {}
+
+
+def channel_getter(attributes):
+    """
+    Returns a function that fetches a tuple of the named attributes
+    """
+    if attributes not in _channel_getters:
+        getter = attrgetter(*attributes)
+        if len(attributes) == 1:
+            single = getter
+            getter = lambda obj: (single(obj),)
+        _channel_getters[attributes] = getter
+    return _channel_getters[attributes]
+
+
 class PhysicalDevice(object):
     """
     This item represents an element that provides channel data to a network.
     """
 
+    # attributes are kept in slots, but a __dict__ is still allocated when
+    # any other attribute is set
+    __slots__ = ('channels', 'intensity', 'gamma', 'start_channel',
+            'generation', 'channel_offsets', 'channel_attributes', '_networks',
+            '__dict__', '__weakref__')
+
     def __init__(self, start_channel=1, *args, **kwargs):
         """
         start_channel: The first channel this device occupies in a
@@ -36,44 +64,89 @@ class PhysicalDevice(object):
         self.channels[start_channel] = 'intensity'
         self.gamma = None
         self.start_channel = start_channel
+        # incremented whenever channel values change, so networks only write
+        # the channels of devices that changed
+        self.generation = 0
+        # compiled from channels by compile_channels
+        self.channel_offsets = None
+        self.channel_attributes = None
+        # weak references to the networks holding this device, set by
+        # BaseNetwork.add_element
+        self._networks = ()
+
+    def compile_channels(self):
+        """
+        Compile the channels dictionary into the fixed tables of frame offsets
+        and attribute names used by update_data. This is done when the show
+        starts and when the device is added to a network, and must be called
+        again if the channels dictionary is changed afterwards.
+        """
+        channels = sorted(self.channels.items())
+        self.channel_offsets = tuple(c - 1 for c, a in channels)
+        self.channel_attributes = tuple(a for c, a in channels)
+        channel_getter(self.channel_attributes)
+
+    def patch(self, channel, attribute):
+        """
+        Map a channel to an attribute of this device, the networks holding
+        the device map its channels again
+        """
+        offsets = self.channel_offsets
+        self.channels[channel] = attribute
+        self.compile_channels()
+        self.mark_dirty()
+        for network in self._networks:
+            network = network()
+            if network is not None:
+                network.repatch(self, offsets)
 
     def update_channels(self):
-        # apply dimming or other adjustments
-        if self.gamma:
-            # TODO for now gamma is as an 8 bit lookup
-            dmx_val = int(self.intensity * 255)
-            val = self.gamma[dmx_val]
-            self.intensity = val / 255
+        # bring channel attributes up to date before they are read
+        pass
 
     def set_intensity(self, intensity):
-        # TODO note this setter may be superfluos
-        self.intensity = intensity
+        if intensity != self.intensity:
+            self.intensity = intensity
+            self.generation += 1
+
+    def mark_dirty(self):
+        """
+        Flag that channel values have changed. Needed after setting a channel
+        attribute directly, rather than through set_intensity or set_hsv.
+        """
+        self.generation += 1
 
     def update_data(self, data):
         """
         This method is called by the network containing this item in order to
         retrieve the current channel values.
 
-        Data is an array of data (ie DMX) that should be updated
-        with this light's channels
+        Data is the network's working frame of 0-1 float values that should be
+        updated with this light's channels
         """
         self.update_channels()
-        for channel, value in self.channels.items():
-            try:
-                # targeted optimization:
-                val = self.__dict__[value]
-            except AttributeError:
-                val = getattr(self, value)
-            # TODO current design flaw/limitation
-            # using byte arrays instead of float arrays for base
-            # data structure - means forcing to bytes here instead
-            # of output network level - practically this is OK as all
-            # networks are using 1 byte max per channel
-            # Here the channel values are highest value wins
-            data[channel - 1] = max(data[channel - 1], int(val * 255))
+        if self.channel_offsets is None:
+            self.compile_channels()
+        values = channel_getter(self.channel_attributes)(self)
+        gamma = self.gamma
+        if gamma and 'intensity' in self.channel_attributes:
+            # gamma is applied to the value written, intensity is left as it
+            # was set so an unchanged intensity does not mark the device dirty
+            # TODO for now gamma is as an 8 bit lookup
+            values = [gamma[int(v * 255)] / 255 if a == 'intensity' else v
+                    for a, v in zip(self.channel_attributes, values)]
+        for offset, val in zip(self.channel_offsets, values):
+            # Here the channel values are highest value wins, conversion to
+            # the network's output format happens once per frame in
+            # BaseNetwork.quantize
+            if val > data[offset]:
+                data[offset] = val
 
 
 class RGBDevice(PhysicalDevice):
+
+    __slots__ = ('red', 'green', 'blue', 'hsv', 'rendered_hsv')
+
     def __init__(self, *args, **kwargs):
         super(RGBDevice, self).__init__(*args, **kwargs)
         # need to add in the self.channels[start_channel+n] = 'red'
@@ -84,10 +157,30 @@ class RGBDevice(PhysicalDevice):
         self.channels[self.start_channel + 1] = 'green'
         self.channels[self.start_channel + 2] = 'blue'
         self.gamma = DIYC_DIM
+        # the hue, saturation and value to render, and those last converted
+        self.hsv = None
+        self.rendered_hsv = None
+
+    def set_hsv(self, hue, saturation, value):
+        hsv = (hue, saturation, value)
+        if hsv != self.hsv:
+            self.hsv = hsv
+            self.generation += 1
+
+    def update_color(self):
+        """
+        Convert the pending hsv values to RGB, skipped when they have not
+        changed since the last conversion.
+        """
+        hsv = self.hsv
+        if hsv is not None and hsv != self.rendered_hsv:
+            self.red, self.green, self.blue = colorsys.hsv_to_rgb(*hsv)
+            self.rendered_hsv = hsv
 
     def update_channels(self):
-        # update RGB only once per cycle here, instead of
-        # every hue update
+        # update RGB only once per cycle here, as part of the network's pass
+        # over its devices, instead of every hue update
+        self.update_color()
         super(RGBDevice, self).update_channels()
 
 
@@ -98,6 +191,22 @@ class BaseLightElement(object):
 
     # TODO need to factor the ADSR related parts out of this class
 
+    # a weak reference to the show this element was added to, set by
+    # LightShow.add_element
+    _show = None
+
+    # weak references to the groups holding this element in a show, set by
+    # LightShow.add_element so an element triggered on its own activates them
+    _parents = ()
+
+    # the ADSR envelope built for each element, ADSREnvelope is the object
+    # tree the compiled envelope flattens
+    envelope_class = CompiledADSREnvelope
+
+    # false for elements advanced elsewhere, such as by an array engine, with
+    # nothing of their own to update - the show and groups skip them
+    needs_update = True
+
     def __init__(self,
             name="unamed_LightElements",
             bell_mode=False,
@@ -130,7 +239,7 @@ class BaseLightElement(object):
         self.trigger_intensity = 0.0
         self.bell_mode = bell_mode
         self.name = name
-        self.adsr_envelope = ADSREnvelope(**kwargs)
+        self.adsr_envelope = self.envelope_class(**kwargs)
         # a simple element has values set externally and does not update
         self.simple = simple
         self.trigger_state = 0
@@ -144,6 +253,40 @@ class BaseLightElement(object):
         # TODO is this method still needed?
         self._off_trigger()
 
+    def free(self):
+        """
+        Give back what this element holds in shared arrays, such as an envelope
+        bank row, once the element is discarded.
+        """
+        free = getattr(self.adsr_envelope, 'free', None)
+        if free is not None:
+            free()
+
+    def activate(self):
+        """
+        Put this element in its show's active set, so that it is updated each
+        frame until update_active is no longer true.
+        """
+        if self._show is not None:
+            show = self._show()
+            if show is not None:
+                show.activate(self)
+                return
+        # an element only held by groups is updated through them
+        for parent in self._parents:
+            parent = parent()
+            if parent is not None:
+                parent.activate()
+
+    def add_parent(self, group):
+        """
+        Record a group holding this element, to be activated along with it.
+        """
+        parents = [p for p in self._parents if p() is not None]
+        if not any(p() is group for p in parents):
+            parents.append(weakref.ref(group))
+        self._parents = parents
+
     @property
     def update_active(self):
         """
@@ -159,7 +302,7 @@ class BaseLightElement(object):
         if (self.simple or not (self.update_active)):
             # light is inactive or in sustain mode
             return self.intensity
-        if self.bell_mode and self.adsr_envelope.segments[0].index == 1:
+        if self.bell_mode and self.adsr_envelope.attack_completed:
             # bell mode ignores trigger off - simulate trigger off once
             # sustain levels are reached
             self.bell_reset()
@@ -193,7 +336,7 @@ class BaseLightElement(object):
         # mostly to be overridden by subclasses
         self._intensity = intensity
         if hasattr(self, 'device'):
-            self.device.intensity = intensity
+            self.device.set_intensity(intensity)
 
     def get_intensity(self):
         return self._intensity
@@ -211,6 +354,7 @@ class BaseLightElement(object):
 
     def trigger(self, intensity, **kwargs):
         # @@ need toggle mode implementation here
+        self.activate()
         if self.simple:
             self.set_intensity(intensity)
             return
@@ -273,27 +417,32 @@ class RGBLight(LightElement):
         return_value = super(RGBLight, self).update(show)
         # TODO - this funciton needed when tweening hue - but can't be used
         # tweening RGB directly
-        self.update_rgb()
+        # the conversion to RGB is deferred to the network's device pass
+        self.device.set_hsv(*self.get_hsv())
         return return_value
 
-    def update_rgb(self):
-        hue = self._hue
-        saturation = self._saturation
+    def get_hsv(self):
+        """
+        Returns the hue, saturation and value used to calculate RGB values
+        """
         if 'intensity' in self.device.channels.values():
             # if the fixture has its own intensity slider - always calc RGB
             # values at full intensity
             intensity = 1.0
         else:
             intensity = self.intensity
-        # this funct takes all 0-1 values
-        r, g, b = colorsys.hsv_to_rgb(hue, saturation, intensity)
-        if self.normalize and any((r, g, b)):
-            maxval = max((r, g, b))
-            adj = maxval / 1
-            r, g, b = colorsys.hsv_to_rgb(hue, saturation, intensity * adj)
-        self.red = self.device.red = r
-        self.green = self.device.green = g
-        self.blue = self.device.blue = b
+        if self.normalize and intensity:
+            # the brightest RGB channel of an hsv color is its value, so
+            # normalizing by it is the same as squaring the value
+            intensity = intensity * intensity
+        return self._hue, self._saturation, intensity
+
+    def update_rgb(self):
+        self.device.set_hsv(*self.get_hsv())
+        self.device.update_color()
+        self.red = self.device.red
+        self.green = self.device.green
+        self.blue = self.device.blue
 
     # TODO need R, G, B setters - and an update hue mirror
     #
@@ -305,12 +454,15 @@ class RGBLight(LightElement):
 
     def _set_hue(self, hue):
         self._hue = hue
+        # an update is needed to pass the new color on to the device
+        self.activate()
 
     def _get_saturation(self):
         return self._saturation
 
     def _set_saturation(self, saturation):
         self._saturation = saturation
+        self.activate()
         # TODO concept of intensity should be converted to raw RGB for base RGB
         # light no assumption of 4th channel
 
@@ -321,7 +473,7 @@ class RGBLight(LightElement):
         changed
         """
         adjusted_rgb = [x * self.intensity for x in [
-            self.red, self.green, self.blue]]
+            self.device.red, self.device.green, self.device.blue]]
         h, s, v = colorsys.rgb_to_hsv(*tuple(adjusted_rgb))
         self._hue = h
         self._saturation = s
@@ -343,6 +495,7 @@ class LightGroup(BaseLightElement):
         self.max_intensity = 1.0
 
     def trigger(self, sig_intensity, **kwargs):
+        self.activate()
         if sig_intensity:
             intensity = min(self.max_intensity, sig_intensity)
             self.trigger_state = 1
@@ -357,14 +510,25 @@ class LightGroup(BaseLightElement):
         # the group element always has a pseudo-intensity of 1
         [e.set_intensity(e.intensity * intensity) for e in self.elements]
 
+    def free(self):
+        super(LightGroup, self).free()
+        [e.free() for e in self.elements]
+
+    def updated_elements(self):
+        """
+        The elements this group passes updates to
+        """
+        return self.elements
+
     @property
     def update_active(self):
-        return any([e.update_active for e in self.elements])
+        return any(e.update_active for e in self.updated_elements())
 
     def update(self, show):
         if self.trigger_state or self.update_active:
-            for element in self.elements:
-                if element.last_update != show.timecode:
+            for element in self.updated_elements():
+                if (element.needs_update and
+                        element.last_update != show.timecode):
                     # avoide updated sub elements twice if they are also in the
                     # main show list of elements
                     element.update(show)
@@ -403,6 +567,12 @@ class Chase(LightGroup):
         self.move_complete = False
         self.sweep = True
         self.width = 1
+        # elements triggered by a window render, updated until they are done
+        self._live = OrderedSet()
+        # the index range of the window lit by the last render, and the
+        # elements it indexes
+        self._window = (0, 0)
+        self._window_elements = None
 
     def _off_trigger(self):
         self.trigger_state = 0
@@ -427,12 +597,14 @@ class Chase(LightGroup):
             for e in self.elements:
                     # blackout
                     e.trigger(0)
+            self._window = (0, 0)
         elif self.off_mode in ["follow", "reverse"]:
             # reset the chase to follow itself as trigger off
             # TODO - placeholder, not sure anything needs to be done
             self.moving = True
 
     def trigger(self, intensity, **kwargs):
+        self.activate()
         if intensity > 0 and self.trigger_state == 0:  # or note off message
             if self.moving:
                 # we are already in either in an active on or off chase
@@ -484,6 +656,7 @@ class Chase(LightGroup):
         self.move_complete = False
         if self.trigger_state:
             self.moving = True
+            self.activate()
 
     def _get_move_toward(self):
         return self.moveto
@@ -541,6 +714,19 @@ class Chase(LightGroup):
                 self.center_position = self.move_envelope.update(
                         show.time_delta)
 
+    def _live_elements(self):
+        live = self._live
+        for e in [e for e in live if not e.update_active]:
+            live.discard(e)
+        return live
+
+    def updated_elements(self):
+        if self.sweep:
+            return self.elements
+        # only elements the window has lit need updates, elements elsewhere
+        # in a long strip are left alone
+        return self._live_elements()
+
     @property
     def update_active(self):
         return self.moving or super(Chase, self).update_active
@@ -582,7 +768,6 @@ class Chase(LightGroup):
                         e in self.elements[self.last_center:current_center]]
         else:
             # trigger only the width
-            [e.trigger(0) for e in self.elements]
             if current_center > self.moveto:
                 # note, currently there is no difference between start and end
                 # based on direction, the width is always to the left of the
@@ -600,9 +785,30 @@ class Chase(LightGroup):
                 # it shouldn't be 1 - the fix will be to make sweep renders
                 # above work with the trigger state instead of intensity?
                 intensity = 1
-            [e.trigger(intensity) for e in self.elements[start:end]]
+            self._render_window(start, end, intensity)
         self.last_center = current_center
 
+    def _render_window(self, start, end, intensity):
+        # only the elements entering and leaving the window are triggered
+        elements = self.elements
+        if elements is not self._window_elements:
+            [e.trigger(0) for e in elements]
+            self._window = (0, 0)
+            self._window_elements = elements
+        start = max(0, start)
+        end = max(start, min(len(elements), end))
+        last_start, last_end = self._window
+        live = self._live
+        for i in range(last_start, min(last_end, len(elements))):
+            if i < start or i >= end:
+                elements[i].trigger(0)
+        for i in range(start, end):
+            if i < last_start or i >= last_end:
+                e = elements[i]
+                e.trigger(intensity)
+                live.add(e)
+        self._window = (start, end)
+
     @property
     def upper_bound(self):
         return max(self.start_pos, self.end_pos)
@@ -613,20 +819,64 @@ class Chase(LightGroup):
 
 
 class Spawner(BaseLightElement):
+    """
+    Spawns a copy of a model element for each trigger
+
+    Spent copies are kept in a pool and re-armed by later triggers, rather
+    than copying the model again. prewarm fills the pool ahead of time. Spent
+    copies beyond pool_limit are freed instead.
+    """
+
+    # the most spent instances kept, over all pool keys
+    pool_limit = 64
+
     def __init__(self, *args, **kwargs):
         super(Spawner, self).__init__(*args, **kwargs)
         self.model = kwargs.get('model', None)
         self.show = kwargs.get('show')
         self.network = kwargs.get('network')
         self.spawned = {}
+        # spent instances ready to be re-armed, by pool key
+        self.pool = {}
+        self.pooled = 0
         self.channels = []
         self.unique_per_key = True
         self._spawn_counter = 0
 
+    def pool_key(self, key):
+        # any copy of the model can be re-armed for any key
+        return None
+
+    def make_instance(self, key):
+        return deepcopy(self.model)
+
+    def prewarm(self, count, key=None):
+        """
+        Make instances ahead of time until the pool for key holds count
+        """
+        pool = self.pool.setdefault(self.pool_key(key), [])
+        while len(pool) < count:
+            pool.append(self.make_instance(key))
+            self.pooled += 1
+
+    def acquire(self, key):
+        pool = self.pool.get(self.pool_key(key))
+        if pool:
+            self.pooled -= 1
+            return pool.pop()
+        return self.make_instance(key)
+
+    def release(self, key, instance):
+        if self.pooled >= self.pool_limit:
+            instance.free()
+            return
+        self.pool.setdefault(self.pool_key(key), []).append(instance)
+        self.pooled += 1
+
     def spawn(self, key):
         if self.unique_per_key and key in self.spawned:
             return self.spawned[key]
-        instance = deepcopy(self.model)
+        instance = self.acquire(key)
         self.show.add_element(instance)
         if self.unique_per_key:
             self.spawned[key] = instance
@@ -642,6 +892,11 @@ class Spawner(BaseLightElement):
             pass
         return instance
 
+    @property
+    def update_active(self):
+        # stay active until all spawned items are complete
+        return bool(self.spawned)
+
     def update(self, show):
         # remove completed items
         remove = []
@@ -654,9 +909,10 @@ class Spawner(BaseLightElement):
                 self.show.remove_element(e)
                 remove.append(key)
         for key in remove:
-            del(self.spawned[key])
+            self.release(key, self.spawned.pop(key))
 
     def trigger(self, intensity, **kwargs):
+        self.activate()
         if intensity > 0:
             key = kwargs['key'][1]
             new_spawn = self.spawn(key)
@@ -673,12 +929,12 @@ class HitPulse(Spawner):
         self.width = 8
         self.network = None
 
-    def spawn(self, key):
-        if key in self.spawned:
-            return self.spawned[key]
+    def pool_key(self, key):
+        # the copied elements belong to the key they are centered on
+        return key
+
+    def make_instance(self, key):
         center = key
-        # TODO the roles of trigger and spawn need to be better divided
-        random_hue = random.random()
         chase_pair = LightGroup()
         for rev in (True, False):
             chase = Chase(
@@ -695,10 +951,6 @@ class HitPulse(Spawner):
             else:
                 elements = self.elements[center:center + self.width]
             chase.elements = [deepcopy(x) for x in elements]
-            for x in chase.elements:
-                x.hue = random_hue
-                self.network.add_element(x)
-                # self.show.add_element(x, network=self.network)
             chase_pair.elements.append(chase)
             # chase_pair.elements = [deepcopy(x) for x in self.elements[30:31]]
             # self.show.add_element(chase)
@@ -707,12 +959,25 @@ class HitPulse(Spawner):
             # for x in chase_pair.elements:
                 # x.hue = random_hue
                 # self.network.add_element(x)
+        return chase_pair
 
+    def spawn(self, key):
+        if key in self.spawned:
+            return self.spawned[key]
+        # TODO the roles of trigger and spawn need to be better divided
+        random_hue = random.random()
+        chase_pair = self.acquire(key)
+        for chase in chase_pair.elements:
+            for x in chase.elements:
+                x.hue = random_hue
+                self.network.add_element(x)
+                # self.show.add_element(x, network=self.network)
         self.spawned[key] = chase_pair
         self.show.add_element(chase_pair)
         return chase_pair
 
     def trigger(self, intensity, **kwargs):
+        self.activate()
         if intensity > 0:
             # TODO need input range
             # key = kwargs['key'][1] - 50
@@ -736,7 +1001,15 @@ class Pulse(object):
     """
     handles the rendering of a pulse in the abstract sense
     a range of values that change over distance
+
+    The node values are computed for kernel_resolution steps of the center's
+    position between elements, once for each set of widths and shapes, and
+    the center is rounded to the nearest step. A kernel_resolution of None
+    computes the nodes for the exact center each time.
     """
+
+    kernel_resolution = 64
+
     def __init__(self,
             left_width=3,
             left_shape=tween.LINEAR,
@@ -751,6 +1024,42 @@ class Pulse(object):
         self.nodes = []  # a list of element values for pulse
         self.node_range = []  # index range of current pulse
         self.current_position = 0
+        self._kernel_key = None
+        self._kernels = None
+
+    def _compute_nodes(self, node_offset):
+        nodes = []
+        left_shape = self.left_shape
+        right_shape = self.right_shape
+        # heavy curves are evaluated from their tables, as envelopes do
+        if left_shape in tween.TABLE_TWEENS:
+            left_shape = tween.table(left_shape).evaluate
+        if right_shape in tween.TABLE_TWEENS:
+            right_shape = tween.table(right_shape).evaluate
+        for n in range(self.left_width + 1):
+            nodes.append(left_shape(
+                        n + node_offset, 1, -1, self.left_width + 1.0))
+        nodes.reverse()
+        for n in range(1, self.right_width + 1):
+            nodes.append(right_shape(
+                    max(0, n - node_offset), 1, -1, self.right_width + 1.0))
+        nodes.append(0)
+        return nodes
+
+    def get_kernel(self, node_offset):
+        """
+        The node values for a center node_offset past an element
+        """
+        resolution = self.kernel_resolution
+        if not resolution:
+            return self._compute_nodes(node_offset)
+        key = (self.left_width, self.left_shape, self.right_width,
+                self.right_shape, resolution)
+        if key != self._kernel_key:
+            self._kernels = [tuple(self._compute_nodes(step / resolution))
+                    for step in range(resolution + 1)]
+            self._kernel_key = key
+        return list(self._kernels[int(round(node_offset * resolution))])
 
     def set_current_nodes(self):
         """
@@ -764,18 +1073,10 @@ class Pulse(object):
         node_offset = self.center_position % 1
         left_of_center = math.floor(self.center_position)
         far_left = int(left_of_center - self.left_width)
-        self.nodes = []
-        for n in range(self.left_width + 1):
-            self.nodes.append(self.left_shape(
-                        n + node_offset, 1, -1, self.left_width + 1.0))
+        self.nodes = self.get_kernel(node_offset)
         if far_left >= 1:
-            self.nodes.append(0)
+            self.nodes.insert(0, 0)
             far_left -= 1
-        self.nodes.reverse()
-        for n in range(1, self.right_width + 1):
-            self.nodes.append(self.right_shape(
-                    max(0, n - node_offset), 1, -1, self.right_width + 1.0))
-        self.nodes.append(0)
         self.node_range = range(far_left, far_left + len(self.nodes))
         logger.debug("NodeData:")
         logger.debug(self.node_range)
@@ -806,6 +1107,11 @@ class PulseChase(Chase, Pulse):
         self.anti_alias = True
         self.continuation_mode = 'pong'
 
+    def updated_elements(self):
+        # only elements the pulse has triggered need updates, elements
+        # elsewhere in a long strip are left alone
+        return self._live_elements()
+
     def update(self, show):
         super(PulseChase, self).update(show)
         logger.debug("%s Centered @ %s -> %s" %
@@ -813,14 +1119,34 @@ class PulseChase(Chase, Pulse):
 
     def render(self):
         self.set_current_nodes()
-        for i, e in enumerate(self.elements):
+        elements = self.elements
+        live = self._live
+        if elements is not self._window_elements:
+            # release whatever was lit from other elements
+            for e in live:
+                e.trigger(0)
+            self._window = (0, 0)
+            self._window_elements = elements
+        nodes = self.nodes
+        first = self.node_range[0]
+        start = max(0, first)
+        end = max(start, min(len(elements), first + len(nodes)))
+        # only elements leaving, staying in or entering the pulse are
+        # triggered
+        last_start, last_end = self._window
+        for i in range(last_start, min(last_end, len(elements))):
+            if i < start or i >= end:
+                elements[i].trigger(0)
+        for i in range(start, end):
+            e = elements[i]
             e.trigger(0)
-            if i in self.node_range:
-                # TODO issue here with a moving pulse:
-                # how does the element handle multiple on triggers
-                # the trigger 0 is needed otherwise the leading edge just stays
-                # dim
-                e.trigger(self.nodes[i - self.node_range[0]])
+            # TODO issue here with a moving pulse:
+            # how does the element handle multiple on triggers
+            # the trigger 0 is needed otherwise the leading edge just stays
+            # dim
+            e.trigger(nodes[i - first])
+            live.add(e)
+        self._window = (start, end)
 
 
 class LightShow(object):
@@ -840,6 +1166,9 @@ class LightShow(object):
         # self.scenemanager = SceneManager()
         self.frame_delay = 1 / self.frame_rate
         self.running = True
+        # the show's elements by name, and where elements only added to a
+        # network were last found
+        self.names = NameIndex()
         self.named_elements = {}
         self.default_network = DefaultNetwork()
         self.networks.append(self.default_network)
@@ -847,7 +1176,28 @@ class LightShow(object):
         self.recent_frames = deque()
         self.average_framerate = self.frame_delay
         self.frame = 0
-        self.elements = []
+        # run_live's frame timing, its histogram records how late frames go
+        # out and how many are skipped
+        self.scheduler = FrameScheduler(self.frame_rate)
+        self.timecode = 0
+        self.elements = OrderedSet()
+        # elements that are updated each frame - elements enter when
+        # triggered and leave once update_active is no longer true
+        self.active_elements = OrderedSet()
+        # activations are queued as triggers may come from input threads
+        self._activations = deque()
+        # an optional birdfish.engine.ArrayEngine advanced before elements
+        self.engine = None
+        # an optional birdfish.parallel.ParallelRenderer that updates and
+        # renders the networks in worker processes
+        self.renderer = None
+        # an optional birdfish.profiler.FrameProfiler timing each frame
+        self.profiler = None
+        # an optional birdfish.recording.Recorder of every frame sent
+        self.recorder = None
+        # send each network's frames from its own thread in run_live
+        self.output_threads = False
+        self.senders = []
 
     def add_element(self, element, network=None):
         if network:
@@ -855,7 +1205,37 @@ class LightShow(object):
             if network not in self.networks:
                 self.networks.append(network)
         if element not in self.elements:
-            self.elements.append(element)
+            self.elements.add(element)
+            self.names.add(element)
+            element._show = weakref.ref(self)
+            self._add_parents(element)
+            # each element gets at least one update
+            self.activate(element)
+
+    def _add_parents(self, element):
+        for sub_element in getattr(element, 'elements', None) or ():
+            if isinstance(sub_element, BaseLightElement):
+                sub_element.add_parent(element)
+                self._add_parents(sub_element)
+
+    def activate(self, element):
+        """
+        Schedule an element to be updated each frame while it is active
+        """
+        self._activations.append(element)
+
+    def _add_activations(self):
+        added = []
+        activations = self._activations
+        while activations:
+            element = activations.popleft()
+            # elements removed from the show no longer have a show reference
+            if element not in self.active_elements and (
+                    getattr(element, '_show', None) is not None) and (
+                    getattr(element, 'needs_update', True)):
+                self.active_elements.add(element)
+                added.append(element)
+        return added
 
     def remove_element(self, element, network=None):
         if hasattr(element, 'elements') and element.elements:
@@ -863,11 +1243,13 @@ class LightShow(object):
                 self.remove_element(sub_element)
         for network in self.networks:
             network.remove_element(element)
-        try:
-            self.elements.remove(element)
-            return True
-        except ValueError:
+        self.active_elements.discard(element)
+        element._show = None
+        if element not in self.elements:
             return False
+        self.elements.discard(element)
+        self.names.discard(element)
+        return True
 
     def blackout(self):
         for n in self.networks:
@@ -877,22 +1259,46 @@ class LightShow(object):
                     e.intensity = 0
 
     def get_named_element(self, name):
-        if name in self.named_elements:
-            # a simple cache
-            return self.named_elements[name]
+        """
+        The element with name, regardless of case, from the show's elements or
+        else its networks, or False when there is none
+        """
+        element = self.names.get(name)
+        if element is not None:
+            return element
+        key = name.lower()
+        if key in self.named_elements:
+            network, element = self.named_elements[key]
+            # only while the network still has the element
+            if network.names.get(key) is element:
+                return element
+            del self.named_elements[key]
         for network in self.networks:
-            named_light = network.get_named_element(name)
-            if named_light:
-                self.named_elements[name] = named_light
-                return named_light
+            element = network.names.get(key)
+            if element is not None:
+                self.named_elements[key] = (network, element)
+                return element
         return False
 
-    def init_show(self):
+    def init_data(self):
+        """
+        Set up the networks and frame timing, without starting any output
+        """
         # needed as params may be changed between __init__ and run_live
+        # init_data also compiles the channel maps of each network's devices
         for n in self.networks:
             n.init_data()
         self.frame_delay = 1.0 / self.frame_rate
 
+    def init_show(self):
+        self.init_data()
+        if self.renderer is not None:
+            self.renderer.start()
+        if self.output_threads and not self.senders:
+            self.senders = [OutputSender(n) for n in self.networks]
+            for sender in self.senders:
+                sender.start()
+
     def frame_average(self, frame):
         self.recent_frames.append(frame)
         frame_count = len(self.recent_frames)
@@ -910,59 +1316,149 @@ class LightShow(object):
         for i in range(count):
             self.timecode += self.frame_delay
             self.time_delta = self.frame_delay
+            if self.profiler is not None:
+                self.profiler.begin_frame(self.timecode)
             self.update()
-            for n in self.networks:
-                n.send_data()
+            self.send_data()
+            if self.profiler is not None:
+                self.profiler.end_frame()
             if speed and count > 1 and i < (count - 1):
                 time.sleep((1 / speed) * self.frame_delay)
 
     def run_live(self):
         self.init_show()
+        scheduler = self.scheduler
+        scheduler.frame_delay = self.frame_delay
+        scheduler.start()
         self.show_start = time.time()
         self.timecode = 0
         while self.running:
-            # projected frame event time
-            now = time.time() + self.frame_delay
-            timecode = now - self.show_start
+            # frames are rendered for the time they are scheduled to go out
+            deadline = scheduler.next_frame()
+            timecode = scheduler.timecode
             self.time_delta = timecode - self.timecode
             self.timecode = timecode
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.begin_frame(timecode)
             self.update()
-            post_update = time.time()
-            # how long did this update actually take
-            effective_frame = post_update - (now - self.frame_delay)
-            effective_framerate = self.frame_average(effective_frame)
-            discrepancy = effective_framerate - self.frame_delay
-            if discrepancy > .01:
-                self.frame_delay += .01
-                if discrepancy > .3:
-                    warnings.warn("Slow refresh")
-            elif discrepancy < -.01 and self.frame_delay > 1 / self.frame_rate:
-                # we can speed back up
-                self.frame_delay -= .01
+            if self.senders:
+                # the senders hold each frame until its deadline
+                self.send_data(deadline=deadline)
+            else:
+                if profiler is not None:
+                    profiler.mark('wait')
+                scheduler.wait()
+                self.send_data()
+            if profiler is not None:
+                profiler.end_frame()
             self.frame += 1
-            remainder = self.frame_delay - effective_frame
-            if remainder > 0:
-                # we finished early, wait to send the data
-                # TODO this wait could/should happen in another thread that
-                # handles the data sending - but currently sending the data
-                # is fast enough that this can be investigated later
-                time.sleep(remainder)
-            # pre_send = time.time()
+            if self.frame == self.frame_rate:
+                histogram = self.jitter_histogram()
+                print('framerate: ', 1 / self.frame_delay, " late p99: ",
+                        histogram.percentile(99), " overruns: ",
+                        histogram.overruns)
+                self.frame = 0
+        for sender in self.senders:
+            sender.stop()
+        self.senders = []
+        if self.renderer is not None:
+            self.renderer.stop()
+
+    def jitter_histogram(self):
+        """
+        How late frames went out - with output threads frames are sent by the
+        senders, and their histograms are merged with the scheduler's
+        overruns
+        """
+        histogram = self.scheduler.histogram
+        if not self.senders:
+            return histogram
+        merged = JitterHistogram()
+        merged.overruns = histogram.overruns
+        for sender in self.senders:
+            merged.merge(sender.histogram)
+        return merged
+
+    def send_data(self, deadline=None):
+        self._send_frames(deadline)
+        if self.recorder is not None:
+            self.recorder.add(self.timecode, self.recorder.networks)
+
+    def _send_frames(self, deadline):
+        profiler = self.profiler
+        if not self.senders:
+            if self.renderer is not None:
+                if profiler is not None:
+                    profiler.mark('send_data')
+                self.renderer.send_data()
+                return
+            if profiler is not None:
+                # write the frames first so the two are timed separately
+                profiler.mark('update_data')
+                for n in self.networks:
+                    n.update_data()
+                profiler.mark('send_data')
             for n in self.networks:
                 n.send_data()
-            if self.frame == 40:
-                # print [e.channels for e in self.networks[1].elements]
-                print('framerate: ', 1 / self.frame_delay, " Remainder: ",
-                        remainder)
-                self.frame = 0
+            return
+        if profiler is not None:
+            profiler.mark('send_wait')
+        # the previous frame must be sent before the next is swapped in
+        for sender in self.senders:
+            sender.wait()
+        if profiler is not None:
+            profiler.mark('update_data')
+        if self.renderer is not None:
+            self.renderer.render()
+        else:
+            for n in self.networks:
+                n.render()
+        for sender in self.senders:
+            sender.send(deadline)
 
     def update(self):
         """The main show update command"""
         # self.scenemanager.update(self)
-        for element in self.elements:
-            if element.last_update != self.timecode:
-                # avoid updating the same element twice
-                element.update(self)
-                element.last_update = self.timecode
+        profiler = self.profiler
+        if self.renderer is not None:
+            if profiler is not None:
+                profiler.mark('render')
+            # the workers update their own copies of the elements
+            self.renderer.update(self.timecode, self.time_delta)
+            return
+        if profiler is not None:
+            profiler.mark('engine')
+        if self.engine is not None:
+            self.engine.update(self)
+        if profiler is not None:
+            profiler.mark('input')
+        # only elements in the active set are visited, so idle elements cost
+        # nothing per frame, triggers from inputs enter the set here
+        self._add_activations()
+        if profiler is not None:
+            profiler.mark('elements')
+        timed = profiler is not None and profiler.per_class
+        pending = list(self.active_elements)
+        while pending:
+            for element in pending:
+                if element.last_update != self.timecode:
+                    # avoid updating the same element twice
+                    if timed:
+                        profiler.update(element, self)
+                    else:
+                        element.update(self)
+                    element.last_update = self.timecode
+            # elements triggered by other elements during this frame are
+            # updated in the same frame
+            pending = self._add_activations()
+        for element in list(self.active_elements):
+            if not getattr(element, 'update_active', True):
+                self.active_elements.discard(element)
+        if profiler is not None:
+            profiler.mark('effects')
         for e in self.effects:
-            e.update(self)
+            if timed:
+                profiler.update(e, self)
+            else:
+                e.update(self)
@@ -0,0 +1,139 @@
+from __future__ import division
+import array
+import heapq
+import itertools
+
+
+class FrameCapture(object):
+    """
+    The rendered frames of a set of networks, kept in memory
+
+    The channel data of each network is appended to one flat array per
+    network, so frame i of a network is the slice [i * size:(i + 1) * size].
+    """
+
+    def __init__(self, networks):
+        self.networks = networks
+        self.timecodes = array.array('d')
+        self.channels = [array.array(n.typecode) for n in networks]
+
+    @property
+    def sizes(self):
+        return [len(n.data) for n in self.networks]
+
+    def __len__(self):
+        return len(self.timecodes)
+
+    def add(self, timecode, networks):
+        self.timecodes.append(timecode)
+        for channels, network in zip(self.channels, networks):
+            channels.extend(network.data)
+
+    def frame(self, index):
+        """
+        The channel data of each network for one frame
+        """
+        return [channels[index * size:(index + 1) * size]
+                for channels, size in zip(self.channels, self.sizes)]
+
+    def diff(self, other):
+        """
+        The indexes of frames that differ from those of another capture
+        """
+        different = [i for i in range(min(len(self), len(other)))
+                if self.frame(i) != other.frame(i)]
+        different.extend(range(min(len(self), len(other)),
+            max(len(self), len(other))))
+        return different
+
+
+class FileCapture(object):
+    """
+    Writes rendered frames to a file as they are captured
+
+    Each frame is the channel data of every network in turn, so frames have a
+    fixed stride and frame i starts at byte i * stride.
+    """
+
+    def __init__(self, f, networks):
+        self.file = f
+        self.networks = networks
+        self.count = 0
+
+    @property
+    def stride(self):
+        return sum(n.data.itemsize * len(n.data) for n in self.networks)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, timecode, networks):
+        for network in networks:
+            network.data.tofile(self.file)
+        self.count += 1
+
+
+class OfflineRenderer(object):
+    """
+    Render a show without any output, as fast as it will go
+
+    The show's clock is advanced a frame at a time instead of following real
+    time, and the networks render each frame into a capture instead of
+    sending it. Triggers and other changes are scheduled at show times with
+    schedule.
+    """
+
+    def __init__(self, show, networks=None):
+        self.show = show
+        self.networks = networks
+        self.events = []
+        self._counter = itertools.count()
+
+    def schedule(self, timecode, function, *args, **kwargs):
+        """
+        Call function at a show timecode, before that frame is updated
+        """
+        heapq.heappush(self.events, (timecode, next(self._counter),
+            function, args, kwargs))
+
+    def _fire_events(self, timecode):
+        events = self.events
+        while events and events[0][0] <= timecode:
+            event_time, count, function, args, kwargs = heapq.heappop(events)
+            function(*args, **kwargs)
+
+    def render(self, duration, capture=None):
+        """
+        Render duration seconds of the show into capture, a FrameCapture of
+        the networks by default, which is returned
+        """
+        show = self.show
+        # only the networks are set up, a show's output threads and render
+        # workers are not started, and elements are updated here
+        show.init_data()
+        renderer = show.renderer
+        show.renderer = None
+        try:
+            return self._render(duration, capture)
+        finally:
+            show.renderer = renderer
+
+    def _render(self, duration, capture):
+        show = self.show
+        networks = self.networks
+        if networks is None:
+            # networks without channels, like the default network, are skipped
+            networks = [n for n in show.networks if len(n.data)]
+        if capture is None:
+            capture = FrameCapture(networks)
+        frame_delay = show.frame_delay
+        frames = int(round(duration / frame_delay))
+        for i in range(frames):
+            show.timecode += frame_delay
+            show.time_delta = frame_delay
+            self._fire_events(show.timecode)
+            show.update()
+            for network in networks:
+                network.render()
+            capture.add(show.timecode, networks)
+        return capture
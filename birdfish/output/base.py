@@ -1,4 +1,8 @@
 import array
+from collections import defaultdict
+import weakref
+
+from birdfish.utils import NameIndex, OrderedSet
 
 
 class BaseNetwork(object):
@@ -6,52 +10,317 @@ class BaseNetwork(object):
     def __init__(self):
         # TODO - should a network have a keep alive attr?
         self.dmx_keep_alive = True
-        self.elements = []
+        # devices, in the order they were added
+        self.elements = OrderedSet()
+        # the devices written into the frame one at a time, and the writers
+        # of devices written in bulk, see _frame_rows
+        self._written = OrderedSet()
+        self._row_writers = OrderedSet()
+        # the elements whose devices were added, by name
+        self.names = NameIndex()
+        # the working frame devices write their 0-1 channel values into
+        self.frame = array.array('f', ())
+        # the quantized channel data that is sent, this is always the last
+        # complete frame - the next frame is quantized into a back buffer and
+        # swapped in, so senders can keep reading data while a frame renders
         self.data = array.array('B', ())
+        self._back_data = array.array('B', ())
+        # zeroed frame used to clear the working frame in place
+        self._blank = array.array('f', ())
+        # 8 bit for DMX style outputs, 16 bit for outputs that take a pair of
+        # bytes per channel
+        self.bit_depth = 8
+        # optional lookup table of 8 bit or bit depth values, indexed by the
+        # channel value scaled to the table's size
+        self._gamma = None
+        # the gamma table scaled to the bit depth, and what it was made for
+        self._lookup = None
+        self._lookup_key = None
+        # the generation of each device when its channels were last written
+        self._generations = {}
+        # the devices writing to each frame offset, to find overlapping devices
+        self._offset_devices = defaultdict(list)
+        # frame offsets left by removed devices, to be cleared next frame
+        self._vacated = set()
+        # whether the frame has changed since it was last quantized
+        self.changed = True
+        # offsets written since the frame was last quantized, the whole frame
+        # is quantized when _dirty is None
+        self._dirty = None
 
     def init_data(self):
         max_chan = 0
+        self._offset_devices.clear()
         for l in self.elements:
+            l.compile_channels()
+            if l in self._written:
+                self._map_offsets(l)
             for c in l.channels:
                 max_chan = max(max_chan, c)
-        self.data.extend([0 for i in range(max_chan)])
+        max_chan = max(max_chan, len(self.frame))
+        self.frame = array.array('f', (0,) * max_chan)
+        self._blank = array.array('f', (0,) * max_chan)
+        self.data = array.array(self.typecode, (0,) * max_chan)
+        self._back_data = array.array(self.typecode, (0,) * max_chan)
+        self._generations.clear()
+        self._vacated.clear()
+        for writer in self._row_writers:
+            writer.reset()
+        self.changed = True
+        self._dirty = None
+
+    def _frame_rows(self, device):
+        # the devices of an array engine can be written by the engine, for all
+        # its rows at once
+        frame_rows = getattr(device, 'frame_rows', None)
+        if frame_rows is not None:
+            return frame_rows(self)
+        return None
+
+    def _map_offsets(self, device):
+        for offset in device.channel_offsets:
+            self._offset_devices[offset].append(device)
+
+    def _unmap_offsets(self, device, offsets=None):
+        if offsets is None:
+            offsets = device.channel_offsets
+        for offset in offsets or ():
+            devices = self._offset_devices[offset]
+            if device in devices:
+                devices.remove(device)
+            self._vacated.add(offset)
+
+    def _get_gamma(self):
+        return self._gamma
+
+    def _set_gamma(self, gamma):
+        self._gamma = gamma
+        self.changed = True
+        self._dirty = None
+
+    gamma = property(_get_gamma, _set_gamma)
+
+    @property
+    def typecode(self):
+        if self.bit_depth == 16:
+            return 'H'
+        return 'B'
 
     def blackout(self):
         # @@ todo
         pass
 
     def reset(self):
-        self.data = array.array('B', (0,) * len(self.data))
+        """
+        Clear the working frame, so every device is written again on the next
+        update
+        """
+        # same length slice assignment copies in place, without allocating
+        self.frame[:] = self._blank
+        self._generations.clear()
+        for writer in self._row_writers:
+            writer.reset()
+        self.changed = True
+        self._dirty = None
 
     def add_element(self, element):
-        if element.device not in self.elements:
-            self.elements.append(element.device)
+        device = element.device
+        if device not in self.elements:
+            self.elements.add(device)
+            self.names.add(element, device)
+            device.compile_channels()
+            if not any(n() is self for n in device._networks):
+                device._networks = [n for n in device._networks
+                        if n() is not None] + [weakref.ref(self)]
+            self._route(device)
             return True
         return False
-        # TODO element.network=self? will this ever be needed?
+
+    def _route(self, device):
+        # hand the device to the writer of its frame rows, or write it with
+        # the network's other devices
+        writer = self._frame_rows(device)
+        if writer is not None:
+            writer.add(device)
+            self._row_writers.add(writer)
+        else:
+            self._written.add(device)
+            self._map_offsets(device)
+        if self.frame and max(device.channels) > len(self.frame):
+            # patched beyond the current universe size
+            self.init_data()
+
+    def repatch(self, device, offsets):
+        """
+        Map the channels of a device again after its patch changed, offsets
+        are those it was compiled to before. The old channels are cleared on
+        the next frame.
+        """
+        if device not in self.elements:
+            return
+        self._unmap_offsets(device, offsets)
+        self._written.discard(device)
+        for writer in self._row_writers:
+            writer.discard(device)
+        self._generations.pop(device, None)
+        self._route(device)
+        # engine writers find the channels they share with other devices again
+        for writer in self._row_writers:
+            writer.reset()
 
     def remove_element(self, element):
-        try:
-            self.elements.remove(element)
-            return True
-        except ValueError:
+        # elements are added by light, but stored by device
+        device = getattr(element, 'device', element)
+        if device not in self.elements:
             return False
+        self.elements.discard(device)
+        self.names.discard(device)
+        if device in self._written:
+            self._written.discard(device)
+        else:
+            self._frame_rows(device).discard(device)
+        self._unmap_offsets(device)
+        self._generations.pop(device, None)
+        device._networks = [n for n in device._networks
+                if n() is not None and n() is not self]
+        return True
 
     def get_named_element(self, name):
-        for l in self.elements:
-            # @@ should this be case insensitive?
-            if l.name.lower() == name.lower():
-                return l
-        return False
+        # names are case insensitive
+        element = self.names.get(name)
+        if element is None:
+            return False
+        return element
 
     def add_elements(self, lights):
         for l in lights:
             self.add_element(l)
 
     def update_data(self):
-        [e.update_data(self.data) for e in self.elements]
+        """
+        Write the channels of devices that changed since the last update into
+        the working frame.
+
+        Devices bump their generation when their channel values change, only
+        those devices - and any devices sharing channels with them, so that
+        highest value wins merging stays correct - are written again. Devices
+        of an array engine are written by the engine after the others.
+        """
+        generations = self._generations
+        changed = [e for e in self._written
+                if e.generation != generations.get(e)]
+        vacated = self._vacated
+        writers = self._row_writers
+        if not (changed or vacated or writers):
+            return
+        frame = self.frame
+        offset_devices = self._offset_devices
+        for device in changed:
+            vacated.update(device.channel_offsets)
+        for writer in writers:
+            # channels an engine shares with other devices are cleared and
+            # merged again as the channels of changed devices are
+            vacated.update(writer.changed_offsets(self))
+        rewrite = set(changed)
+        for offset in vacated:
+            frame[offset] = 0
+            devices = offset_devices.get(offset)
+            if devices:
+                rewrite.update(devices)
+        dirty = self._dirty
+        if dirty is not None:
+            dirty.update(vacated)
+        for device in rewrite:
+            device.update_data(frame)
+            generations[device] = device.generation
+            if dirty is not None:
+                dirty.update(device.channel_offsets)
+        written = bool(rewrite or vacated)
+        for writer in writers:
+            offsets = writer.write(self, vacated)
+            if offsets:
+                written = True
+                if dirty is not None:
+                    dirty.update(offsets)
+        vacated.clear()
+        if written:
+            self.changed = True
+
+    def gamma_lookup(self):
+        """
+        The gamma table with its values scaled to the bit depth, so an 8 bit
+        table can be used at 16 bits
+        """
+        gamma = self.gamma
+        key = (id(gamma), len(gamma), self.bit_depth)
+        if key != self._lookup_key:
+            scale = (1 << self.bit_depth) - 1
+            steps = len(gamma) - 1
+            self._lookup = [gamma[i] * scale // steps
+                    for i in range(steps + 1)]
+            self._lookup_key = key
+        return self._lookup
+
+    def quantize(self):
+        """
+        Convert the float working frame into channel data at the network's bit
+        depth, applying gamma. Only the channels written since the last frame
+        are converted, the rest are copied from the last complete frame.
+        Nothing is done when the frame is unchanged, as data already holds it.
+        """
+        if not self.changed:
+            return
+        self.changed = False
+        frame = self.frame
+        back = self._back_data
+        dirty = self._dirty
+        self._dirty = set()
+        if dirty is None or len(dirty) * 2 > len(frame) or (
+                len(back) != len(frame)):
+            offsets = range(len(frame))
+        else:
+            # same length slice assignment copies in place
+            back[:] = self.data
+            offsets = dirty
+        if self.gamma:
+            lookup = self.gamma_lookup()
+            steps = len(lookup) - 1
+            for i in offsets:
+                v = frame[i]
+                if v <= 0:
+                    back[i] = lookup[0]
+                else:
+                    back[i] = lookup[int(v * steps) if v < 1 else steps]
+        else:
+            scale = (1 << self.bit_depth) - 1
+            for i in offsets:
+                v = frame[i]
+                if v <= 0:
+                    back[i] = 0
+                else:
+                    back[i] = int(v * scale) if v < 1 else scale
+        self.swap()
+
+    def swap(self):
+        self.data, self._back_data = self._back_data, self.data
+
+    def render(self):
+        """
+        Build a complete frame of channel data from the current state of the
+        network's elements. Channel values from overlapping elements are merged
+        highest value wins.
+        """
+        self.update_data()
+        self.quantize()
 
     def send_data(self):
+        self.render()
+        self.transmit()
+
+    def transmit(self):
+        """
+        Send the last complete frame in data to the output
+        """
         raise NotImplementedError
 
 
@@ -62,3 +331,6 @@ class DefaultNetwork(BaseNetwork):
     def send_data(self):
         # this class sends no data, only manages higher level objects
         pass
+
+    def transmit(self):
+        pass
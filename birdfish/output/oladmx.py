@@ -33,9 +33,8 @@ class OLA(BaseNetwork):
         self.wrapper = ClientWrapper()
         self.client = self.wrapper.Client()
 
-    def send_data(self):
+    def transmit(self):
         # print U.dmx
-        self.update_data()
         try:
             def dmx_sent(state):
                 self.wrapper.Stop()
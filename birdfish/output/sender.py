@@ -0,0 +1,62 @@
+import logging
+import threading
+import Queue
+
+from birdfish.scheduler import JitterHistogram, monotonic, wait_until
+
+logger = logging.getLogger(__name__)
+
+
+class OutputSender(threading.Thread):
+    """
+    Transmit a network's frames from a separate thread
+
+    The render loop hands each completed frame over with send, along with the
+    time it should go out, and moves on to updating the next frame while the
+    sender waits for that time and transmits. A slow or blocking output then
+    only delays its own network.
+    """
+
+    def __init__(self, network):
+        super(OutputSender, self).__init__()
+        self.daemon = True
+        self.network = network
+        # a single pending frame, the render loop must wait for it to be sent
+        # before it swaps the next frame into the network's data
+        self.frames = Queue.Queue(maxsize=1)
+        self.sent = 0
+        # how late frames were transmitted
+        self.histogram = JitterHistogram()
+
+    def run(self):
+        while True:
+            deadline = self.frames.get()
+            try:
+                if deadline is None:
+                    break
+                self.histogram.record(wait_until(deadline))
+                self.network.transmit()
+                self.sent += 1
+            except Exception:
+                logger.exception("error sending frame")
+            finally:
+                self.frames.task_done()
+
+    def send(self, deadline=None):
+        """
+        Queue the network's current data to be transmitted at deadline, a
+        birdfish.scheduler.monotonic value - or as soon as possible if None
+        """
+        if deadline is None:
+            deadline = monotonic()
+        self.frames.put(deadline)
+
+    def wait(self):
+        """
+        Block until the last frame queued has been transmitted
+        """
+        self.frames.join()
+
+    def stop(self):
+        self.frames.put(None)
+        self.join()
@@ -0,0 +1,197 @@
+from __future__ import division
+import ctypes
+import logging
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+from birdfish.utils import OrderedSet
+
+logger = logging.getLogger(__name__)
+
+_ctypes_codes = {
+        'B': ctypes.c_ubyte,
+        'H': ctypes.c_ushort,
+        }
+
+# how long to wait on a worker before checking that it is still alive
+WORKER_POLL = 1
+
+
+def _copy(destination, source, size):
+    ctypes.memmove(destination, source, size)
+
+
+def _array_address(data):
+    return data.buffer_info()[0]
+
+
+def _feeds(element, devices):
+    """
+    True if an element, or one of its sub-elements, outputs to one of devices
+
+    elements without a device or sub-elements (spawners, effects) are kept as
+    they may create or drive elements on any network
+    """
+    device = getattr(element, 'device', None)
+    children = getattr(element, 'elements', None)
+    if device is None and not children:
+        return True
+    if device is not None and device in devices:
+        return True
+    return any(_feeds(child, devices) for child in children or [])
+
+
+def _all_elements(show):
+    """
+    Every element reachable from the show, in a stable order
+    """
+    found = []
+    seen = set()
+    pending = list(show.elements)
+    while pending:
+        element = pending.pop(0)
+        if id(element) in seen:
+            continue
+        seen.add(id(element))
+        found.append(element)
+        pending.extend(getattr(element, 'elements', None) or [])
+    return found
+
+
+def _render_worker(show, network_indexes, buffers, elements, commands, done):
+    # this runs in the forked copy of the show, so changes to it stay local
+    show.renderer = None
+    networks = [show.networks[i] for i in network_indexes]
+    devices = set()
+    for network in networks:
+        devices.update(getattr(e, 'device', e) for e in network.elements)
+    # only elements that output to this worker's networks are updated here
+    kept = [e for e in show.elements if _feeds(e, devices)]
+    for element in set(show.elements).difference(kept):
+        show.active_elements.discard(element)
+        element._show = None
+    show.elements = OrderedSet(kept)
+    while True:
+        command = commands.get()
+        if command[0] == 'frame':
+            show.timecode, show.time_delta = command[1:]
+            show.update()
+            for network, buffer in zip(networks, buffers):
+                network.render()
+                _copy(ctypes.addressof(buffer), _array_address(network.data),
+                        ctypes.sizeof(buffer))
+            done.release()
+        elif command[0] == 'trigger':
+            index, intensity, kwargs = command[1:]
+            elements[index].trigger(intensity, **kwargs)
+        elif command[0] == 'stop':
+            break
+
+
+class ParallelRenderer(object):
+    """
+    Render the networks of a show in a pool of worker processes
+
+    Each worker is a forked copy of the show that renders a subset of the
+    networks into shared memory frame buffers. The main process only forwards
+    triggers and frame times to the workers and sends the finished frames.
+    """
+
+    def __init__(self, show, processes=None):
+        self.show = show
+        self.processes = processes or multiprocessing.cpu_count()
+        self.workers = []
+        self.queues = []
+        self.buffers = {}
+        self.done = None
+        self.pending = 0
+        self.elements = []
+
+    @property
+    def running(self):
+        return bool(self.workers)
+
+    def start(self):
+        if self.running:
+            return
+        show = self.show
+        # networks without any channels have nothing to render
+        indexes = [i for i, n in enumerate(show.networks) if len(n.data)]
+        processes = max(1, min(self.processes, len(indexes)))
+        self.elements = _all_elements(show)
+        self.done = multiprocessing.Semaphore(0)
+        self.buffers = {}
+        for i in indexes:
+            network = show.networks[i]
+            self.buffers[i] = RawArray(_ctypes_codes[network.typecode],
+                    len(network.data))
+        for shard in range(processes):
+            network_indexes = indexes[shard::processes]
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_render_worker,
+                    args=(show, network_indexes,
+                        [self.buffers[i] for i in network_indexes],
+                        self.elements, queue, self.done))
+            worker.daemon = True
+            worker.start()
+            self.queues.append(queue)
+            self.workers.append(worker)
+        # triggers from inputs in this process are forwarded to the workers,
+        # this is done after forking so the workers keep the real methods
+        for index, element in enumerate(self.elements):
+            element.trigger = self._forward_trigger(index)
+        logger.info("rendering %s networks in %s processes" % (
+            len(indexes), processes))
+
+    def _forward_trigger(self, index):
+        def trigger(intensity, **kwargs):
+            for queue in self.queues:
+                queue.put(('trigger', index, intensity, kwargs))
+        return trigger
+
+    def update(self, timecode, time_delta):
+        """
+        Start rendering a frame in each of the workers
+        """
+        if self.pending:
+            self.wait()
+        for queue in self.queues:
+            queue.put(('frame', timecode, time_delta))
+        self.pending = len(self.queues)
+
+    def wait(self):
+        while self.pending:
+            if self.done.acquire(True, WORKER_POLL):
+                self.pending -= 1
+            elif not all(w.is_alive() for w in self.workers):
+                self.pending = 0
+                raise RuntimeError("A render worker has stopped")
+
+    def render(self):
+        """
+        Wait for the workers to finish the frame and swap it into the data of
+        each network
+        """
+        self.wait()
+        for index, buffer in self.buffers.items():
+            network = self.show.networks[index]
+            _copy(_array_address(network._back_data),
+                    ctypes.addressof(buffer), ctypes.sizeof(buffer))
+            network.swap()
+
+    def send_data(self):
+        self.render()
+        for index in self.buffers:
+            self.show.networks[index].transmit()
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(('stop',))
+        for worker in self.workers:
+            worker.join()
+        for element in self.elements:
+            # restore the element's own trigger method
+            element.__dict__.pop('trigger', None)
+        self.workers = []
+        self.queues = []
+        self.pending = 0
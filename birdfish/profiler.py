@@ -0,0 +1,135 @@
+from __future__ import division
+from collections import deque
+import json
+
+from birdfish.scheduler import monotonic
+
+
+class FrameProfiler(object):
+    """
+    Records how long each phase of the show's frames takes
+
+    The show marks the start of each phase of a frame, a phase runs until the
+    next mark or the end of the frame. The most recent frames are kept in a
+    ring buffer, and can be exported as Chrome trace events to be viewed in
+    chrome://tracing or Perfetto.
+
+    With per_class set, the time spent updating elements and effects is also
+    totalled by class.
+    """
+
+    def __init__(self, frames=2000, per_class=False, clock=monotonic):
+        self.frames = deque(maxlen=frames)
+        self.per_class = per_class
+        self.clock = clock
+        self.origin = clock()
+        self._frame = None
+        self._phase = None
+
+    def begin_frame(self, timecode=0):
+        if self._frame is not None:
+            self.end_frame()
+        self._frame = {
+                'timecode': timecode,
+                'start': self.clock(),
+                'phases': [],
+                'classes': {},
+                }
+
+    def mark(self, phase):
+        """
+        End the current phase and start another
+        """
+        now = self.clock()
+        self._close_phase(now)
+        self._phase = (phase, now)
+
+    def _close_phase(self, now):
+        if self._phase is not None and self._frame is not None:
+            name, start = self._phase
+            self._frame['phases'].append((name, start, now))
+        self._phase = None
+
+    def end_frame(self):
+        if self._frame is None:
+            return
+        now = self.clock()
+        self._close_phase(now)
+        self._frame['end'] = now
+        self.frames.append(self._frame)
+        self._frame = None
+
+    def update(self, item, show):
+        """
+        Update an element or effect, totalling the time by its class
+        """
+        start = self.clock()
+        item.update(show)
+        duration = self.clock() - start
+        if self._frame is not None:
+            classes = self._frame['classes']
+            name = item.__class__.__name__
+            total, count = classes.get(name, (0, 0))
+            classes[name] = (total + duration, count + 1)
+
+    def summary(self):
+        """
+        The mean and max duration of each phase over the recorded frames
+        """
+        totals = {}
+        for frame in self.frames:
+            for name, start, end in frame['phases']:
+                total, peak, count = totals.get(name, (0, 0, 0))
+                duration = end - start
+                totals[name] = (total + duration, max(peak, duration),
+                        count + 1)
+        return dict((name, {'mean': total / count, 'max': peak})
+                for name, (total, peak, count) in totals.items())
+
+    def _us(self, t):
+        return (t - self.origin) * 1e6
+
+    def trace_events(self):
+        """
+        The recorded frames as a list of Chrome trace events
+        """
+        events = []
+        for frame in self.frames:
+            events.append({
+                'name': 'frame', 'cat': 'frame', 'ph': 'X', 'pid': 0,
+                'tid': 0, 'ts': self._us(frame['start']),
+                'dur': (frame['end'] - frame['start']) * 1e6,
+                'args': {'timecode': frame['timecode']},
+                })
+            element_start = frame['start']
+            for name, start, end in frame['phases']:
+                events.append({
+                    'name': name, 'cat': 'phase', 'ph': 'X', 'pid': 0,
+                    'tid': 0, 'ts': self._us(start), 'dur': (end - start) * 1e6,
+                    })
+                if name == 'elements':
+                    element_start = start
+            # class totals are laid end to end from the start of the element
+            # phase, on their own track
+            offset = element_start
+            for name, (total, count) in sorted(frame['classes'].items()):
+                events.append({
+                    'name': name, 'cat': 'class', 'ph': 'X', 'pid': 0,
+                    'tid': 1, 'ts': self._us(offset), 'dur': total * 1e6,
+                    'args': {'count': count},
+                    })
+                offset += total
+        return events
+
+    def export(self, path):
+        """
+        Write the recorded frames to path as Chrome trace event JSON
+        """
+        with open(path, 'w') as f:
+            json.dump({
+                'traceEvents': self.trace_events(),
+                'displayTimeUnit': 'ms',
+                }, f)
+
+    def clear(self):
+        self.frames.clear()
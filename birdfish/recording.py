@@ -0,0 +1,239 @@
+"""
+Recording and playback of rendered DMX frames
+
+A recording is a single file, laid out as:
+
+    header      magic, version, network count, frame delay, frame stride,
+                frame count and the offset of the timestamp index
+    networks    the bytes per channel and channel count of each network
+    frames      fixed stride records of a timecode followed by the channel
+                data of each network in turn
+    index       the timecode of every frame, written when the recording is
+                closed
+
+As each frame record carries its own timecode, the index of a recording that
+was never closed is rebuilt from the frames when it is played.
+"""
+from __future__ import division
+import array
+from bisect import bisect_left
+import ctypes
+import mmap
+import struct
+
+from birdfish.scheduler import monotonic, wait_until
+
+MAGIC = 'BFDMX\x00\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sHHdIIQ')
+NETWORK = struct.Struct('<BI')
+TIMECODE = struct.Struct('<d')
+
+# frames the file grows by whenever the recording fills it
+GROW_FRAMES = 1024
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+class Recorder(object):
+    """
+    Record the rendered frames of networks to a memory mapped file
+
+    A recorder can be used as the capture of an OfflineRenderer, or set as a
+    show's recorder to record a live show as it is sent.
+    """
+
+    def __init__(self, path, networks, frame_delay=1 / 40):
+        self.path = path
+        self.networks = networks
+        self.frame_delay = frame_delay
+        self.file = None
+        self.map = None
+        self.count = 0
+        self.capacity = 0
+        self.timecodes = array.array('d')
+
+    def __len__(self):
+        return self.count
+
+    def _open(self):
+        networks = self.networks
+        self.layout = [(n.data.itemsize, len(n.data)) for n in networks]
+        self.stride = _align(TIMECODE.size + sum(
+            size * count for size, count in self.layout))
+        self.frames_offset = _align(HEADER.size + NETWORK.size * len(networks))
+        self.file = open(self.path, 'w+b')
+        self._grow()
+        self._write_header(0)
+        offset = HEADER.size
+        for size, count in self.layout:
+            NETWORK.pack_into(self.map, offset, size, count)
+            offset += NETWORK.size
+
+    def _write_header(self, index_offset):
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, len(self.layout),
+                self.frame_delay, self.stride, self.count, index_offset)
+
+    def _grow(self):
+        self.capacity += GROW_FRAMES
+        size = self.frames_offset + self.capacity * self.stride
+        self.file.truncate(size)
+        if self.map is None:
+            self.map = mmap.mmap(self.file.fileno(), size)
+        else:
+            self.map.resize(size)
+
+    def add(self, timecode, networks):
+        if self.map is None:
+            self._open()
+        if self.count == self.capacity:
+            self._grow()
+        layout = self.layout
+        for network, (size, count) in zip(networks, layout):
+            # each frame record has a fixed slot for each network
+            if network.data.itemsize != size or len(network.data) != count:
+                raise ValueError("network changed from %s channels of %s "
+                        "bytes to %s of %s during the recording" % (count,
+                            size, len(network.data), network.data.itemsize))
+        if len(networks) != len(layout):
+            raise ValueError("recording has %s networks, %s given" % (
+                len(layout), len(networks)))
+        offset = self.frames_offset + self.count * self.stride
+        TIMECODE.pack_into(self.map, offset, timecode)
+        offset += TIMECODE.size
+        for network in networks:
+            data = network.data.tostring()
+            self.map[offset:offset + len(data)] = data
+            offset += len(data)
+        self.timecodes.append(timecode)
+        self.count += 1
+        # the frame count is kept current so an unclosed recording can be read
+        self._write_header(0)
+
+    def close(self):
+        if self.map is None:
+            return
+        index_offset = self.frames_offset + self.count * self.stride
+        self._write_header(index_offset)
+        self.map.close()
+        self.map = None
+        self.file.truncate(index_offset)
+        self.file.seek(index_offset)
+        self.timecodes.tofile(self.file)
+        self.file.close()
+        self.file = None
+
+
+class Player(object):
+    """
+    Play a recording to networks, without any lights or envelopes
+
+    Each frame is copied from the memory mapped recording straight into the
+    back buffer of each network, and sent at its recorded time.
+    """
+
+    def __init__(self, path, networks, senders=None):
+        self.file = open(path, 'rb')
+        # a private mapping, so frames can be copied from it with ctypes
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+        (magic, version, network_count, self.frame_delay, self.stride,
+                self.count, index_offset) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a birdfish recording" % path)
+        self.layout = [NETWORK.unpack_from(self.map,
+            HEADER.size + i * NETWORK.size) for i in range(network_count)]
+        self.frames_offset = _align(HEADER.size + NETWORK.size * network_count)
+        if index_offset:
+            self.timecodes = array.array('d', self.map[index_offset:
+                index_offset + self.count * TIMECODE.size])
+        else:
+            # never closed, rebuild the index from the frames
+            self.timecodes = array.array('d', (TIMECODE.unpack_from(self.map,
+                self.frames_offset + i * self.stride)[0]
+                for i in range(self.count)))
+        if len(networks) != network_count:
+            raise ValueError("recording has %s networks, %s given" % (
+                network_count, len(networks)))
+        for network, (size, count) in zip(networks, self.layout):
+            if len(network.data) != count and network.elements:
+                raise ValueError("network has %s channels, recording %s" %
+                        (len(network.data), count))
+            network.bit_depth = size * 8
+            if (len(network.data) != count or
+                    network.data.itemsize != size):
+                # a bare network just for playback, or one whose buffers are
+                # of another bit depth, frames are copied in at the
+                # recording's
+                network.data = array.array(network.typecode, (0,) * count)
+                network._back_data = array.array(network.typecode,
+                        (0,) * count)
+        self.networks = networks
+        self.senders = senders
+        self._buffer = ctypes.c_char.from_buffer(self.map)
+        self.running = False
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def duration(self):
+        return self.timecodes[-1] if self.count else 0
+
+    def seek(self, timecode):
+        """
+        The index of the first frame at or after timecode
+        """
+        return bisect_left(self.timecodes, timecode)
+
+    def load(self, index):
+        """
+        Swap frame index into the data of each network
+        """
+        address = (ctypes.addressof(self._buffer) + self.frames_offset +
+                index * self.stride + TIMECODE.size)
+        for network, (size, count) in zip(self.networks, self.layout):
+            back = network._back_data
+            ctypes.memmove(back.buffer_info()[0], address, size * count)
+            network.swap()
+            address += size * count
+
+    def play(self, start=0, end=None, clock=monotonic):
+        """
+        Send the frames from timecode start to end at their recorded times
+        """
+        self.running = True
+        first = self.seek(start)
+        last = self.count if end is None else self.seek(end)
+        if first >= last:
+            return
+        origin = clock() - self.timecodes[first]
+        senders = self.senders
+        for index in range(first, last):
+            if not self.running:
+                break
+            deadline = origin + self.timecodes[index]
+            if senders:
+                for sender in senders:
+                    sender.wait()
+                self.load(index)
+                for sender in senders:
+                    sender.send(deadline)
+            else:
+                wait_until(deadline, clock=clock)
+                self.load(index)
+                for network in self.networks:
+                    network.transmit()
+        if senders:
+            for sender in senders:
+                sender.wait()
+        self.running = False
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        del self._buffer
+        self.map.close()
+        self.file.close()
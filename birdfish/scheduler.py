@@ -0,0 +1,179 @@
+from __future__ import division
+from bisect import bisect_left
+import ctypes
+import ctypes.util
+import math
+import sys
+import time
+
+# how long before a deadline to stop sleeping and spin, sleep can overshoot by
+# a millisecond or more depending on the platform
+SPIN = .002
+
+
+def _posix_monotonic():
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    libc = ctypes.CDLL(ctypes.util.find_library('rt') or
+            ctypes.util.find_library('c'), use_errno=True)
+    clock_gettime = libc.clock_gettime
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    # CLOCK_MONOTONIC on linux
+    clock_id = 1
+    spec = timespec()
+    pointer = ctypes.pointer(spec)
+
+    def monotonic():
+        if clock_gettime(clock_id, pointer):
+            raise OSError(ctypes.get_errno(), "clock_gettime failed")
+        return spec.tv_sec + spec.tv_nsec * 1e-9
+
+    return monotonic
+
+
+def _get_monotonic():
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    if sys.platform.startswith('linux'):
+        try:
+            return _posix_monotonic()
+        except (OSError, AttributeError, TypeError):
+            pass
+    # not monotonic, but the best available
+    return time.time
+
+monotonic = _get_monotonic()
+
+
+def wait_until(deadline, spin=SPIN, clock=monotonic):
+    """
+    Wait for the clock to reach deadline, sleeping for most of the wait and
+    spinning for the last moment, and return how late the wait finished
+    """
+    remaining = deadline - clock()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    now = clock()
+    while now < deadline:
+        now = clock()
+    return now - deadline
+
+
+class JitterHistogram(object):
+    """
+    Counts of how late frames went out, in buckets bounded in seconds
+    """
+
+    bounds = (.0001, .00025, .0005, .001, .002, .005, .01, .025, .05, .1)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+        # frames skipped because rendering fell more than a frame behind
+        self.overruns = 0
+
+    def record(self, lateness):
+        self.counts[bisect_left(self.bounds, lateness)] += 1
+        self.total += 1
+        self.sum += lateness
+        if lateness > self.max:
+            self.max = lateness
+
+    def merge(self, other):
+        """
+        Add the frames recorded by another histogram to this one
+        """
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        self.overruns += other.overruns
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def percentile(self, percent):
+        """
+        The upper bound of the bucket holding the given percentile
+        """
+        if not self.total:
+            return 0
+        rank = int(math.ceil(self.total * percent / 100))
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def reset(self):
+        self.__init__()
+
+    def __str__(self):
+        lines = []
+        low = 0
+        for bound, count in zip(self.bounds + (None,), self.counts):
+            if bound is None:
+                label = '> %.2fms' % (low * 1000)
+            else:
+                label = '<= %.2fms' % (bound * 1000)
+                low = bound
+            lines.append('%12s %d' % (label, count))
+        lines.append('frames: %d overruns: %d mean: %.3fms max: %.3fms' % (
+            self.total, self.overruns, self.mean * 1000, self.max * 1000))
+        return '\n'.join(lines)
+
+
+class FrameScheduler(object):
+    """
+    Schedules frames at absolute deadlines on a monotonic clock
+
+    Deadlines are start + frame * frame_delay, so time spent rendering never
+    accumulates into drift. When rendering falls more than a frame behind,
+    the missed frames are skipped and counted as overruns rather than sent in
+    a burst.
+    """
+
+    def __init__(self, frame_rate=40, spin=SPIN, clock=monotonic):
+        self.frame_delay = 1 / frame_rate
+        self.spin = spin
+        self.clock = clock
+        self.histogram = JitterHistogram()
+        self.start()
+
+    def start(self):
+        self.start_time = self.clock()
+        self.frame = 0
+
+    def next_frame(self):
+        """
+        Advance to the next frame and return its deadline
+        """
+        self.frame += 1
+        late = self.clock() - self.deadline
+        if late > self.frame_delay:
+            # resume with the first frame that is still to come
+            skipped = int(math.ceil(late / self.frame_delay))
+            self.frame += skipped
+            self.histogram.overruns += skipped
+        return self.deadline
+
+    @property
+    def deadline(self):
+        return self.start_time + self.frame * self.frame_delay
+
+    @property
+    def timecode(self):
+        return self.frame * self.frame_delay
+
+    def wait(self):
+        """
+        Wait for the current frame's deadline and record how late it was
+        """
+        lateness = wait_until(self.deadline, self.spin, self.clock)
+        self.histogram.record(lateness)
+        return lateness
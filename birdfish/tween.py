@@ -9,6 +9,7 @@ d = total duration
 """
 # see also: http://gizma.com/easing
 
+import array
 import math
 
 
@@ -186,64 +187,180 @@ def IN_OUT_BACK(t, b, c, d):
         s*=(1.525)
         return c/2*((t)*t*(((s)+1)*t + s) + 2) + b
 
-"""
-Pseudocode from wikipedia
-
-INPUT: Function f, endpoint values a, b, tolerance TOL, maximum iterations NMAX
-CONDITIONS: a < b, either f(a) < 0 and f(b) > 0 or f(a) > 0 and f(b) < 0
-OUTPUT: value which differs from a root of f(x)=0 by less than TOL
-
-N ← 1
-While N ≤ NMAX { limit iterations to prevent infinite loop
-  c ← (a + b)/2 new midpoint
-  If (f(c) = 0 or (b – a)/2 < TOL then { solution found
-    Output(c)
-    Stop
-  }
-  N ← N + 1 increment step counter
-  If sign(f(c)) = sign(f(a)) then a ← c else b ← c new interval
-}
-Output("Method failed.") max number of steps exceeded
-"""
+# curves the envelope profiles evaluate from tables by default. Interpolating
+# a table costs about twice LINEAR, so this only pays for curves that are
+# slower than that to compute directly
+TABLE_TWEENS = set([OUT_ELASTIC])
+
+# curves whose shape, not just their scale, depends on the change in value
+CHANGE_DEPENDENT = set([OUT_ELASTIC])
+
+# samples across the duration of a tween table
+TABLE_RESOLUTION = 1024
+
+# tables of change dependent curves are made per change, past this many
+# tables those curves are evaluated directly
+MAX_TABLES = 256
 
-def bisect_jump_time(tween, value, b, c, d):
+_tables = {}
+
+
+class TweenTable(object):
     """
-    **** Not working yet
-    return t for given value using bisect
-    does not work for whacky curves
+    A tween sampled over normalized time t/d, and evaluated by linear
+    interpolation between the samples
 
+    Called with the same arguments as the tween it samples, so it can be used
+    anywhere a tween is. evaluate is the same function without the method
+    call overhead.
+    """
+
+    def __init__(self, tween, resolution=TABLE_RESOLUTION, change=1.0):
+        self.tween = tween
+        self.resolution = resolution
+        self.change = change
+        # most curves scale with change, so one table serves any change
+        self.scaled = tween not in CHANGE_DEPENDENT
+        sample_change = 1.0 if self.scaled else change
+        self.values = array.array('d', [
+            tween(i / resolution, 0, sample_change, 1.0)
+            for i in range(resolution + 1)])
+        self.__name__ = getattr(tween, '__name__', 'tween')
+        self.evaluate = self._evaluator()
+
+    def _evaluator(self):
+        values = self.values
+        resolution = self.resolution
+        first = values[0]
+        last = values[-1]
+        if self.scaled:
+            def evaluate(t, b, c, d):
+                x = t / d * resolution
+                if x >= resolution:
+                    return b + c * last
+                if x <= 0:
+                    return b + c * first
+                i = int(x)
+                low = values[i]
+                return b + c * (low + (values[i + 1] - low) * (x - i))
+        else:
+            func = self.tween
+            change = self.change
+
+            def evaluate(t, b, c, d):
+                if c != change:
+                    return table(func, c, resolution)(t, b, c, d)
+                x = t / d * resolution
+                if x >= resolution:
+                    return b + last
+                if x <= 0:
+                    return b + first
+                i = int(x)
+                low = values[i]
+                return b + low + (values[i + 1] - low) * (x - i)
+        return evaluate
+
+    def __repr__(self):
+        return '<TweenTable %s>' % self.__name__
+
+    def __deepcopy__(self, memo):
+        # tables are never changed, so they are shared by copies
+        return self
+
+    def __call__(self, t, b, c, d):
+        return self.evaluate(t, b, c, d)
+
+
+def table(tween, change=1.0, resolution=TABLE_RESOLUTION):
     """
-    max_iter = 20
-    resolution = 0.01
-    iter = 1
+    The shared TweenTable for a tween
+    """
+    if isinstance(tween, TweenTable):
+        return tween
+    dependent = tween in CHANGE_DEPENDENT
+    key = (tween, resolution, change if dependent else None)
+    lut = _tables.get(key)
+    if lut is None:
+        if dependent and len(_tables) >= MAX_TABLES:
+            return tween
+        lut = _tables[key] = TweenTable(tween, resolution, change)
+    return lut
+
+def _cube_root(x):
+    return math.copysign(abs(x) ** (1 / 3), x)
+
+
+# the inverse of each curve with a closed form, mapping a fraction of the
+# change in value, 0-1, to a fraction of the duration
+INVERSES = {
+    LINEAR: lambda y: y,
+    IN_QUAD: lambda y: math.sqrt(y),
+    OUT_QUAD: lambda y: 1 - math.sqrt(1 - y),
+    IN_CUBIC: _cube_root,
+    OUT_CUBIC: lambda y: 1 + _cube_root(y - 1),
+    IN_QUART: lambda y: y ** .25,
+    OUT_QUART: lambda y: 1 - (1 - y) ** .25,
+    IN_EXPO: lambda y: 1 + math.log(y, 2) / 10 if y > 0 else 0,
+    OUT_EXPO: lambda y: -math.log(1 - y, 2) / 10 if y < 1 else 1,
+    IN_CIRC: lambda y: math.sqrt(1 - (1 - y) ** 2),
+    OUT_CIRC: lambda y: 1 - math.sqrt(1 - y * y),
+    }
+
+# slices scanned for the first crossing of a value, before bisecting it
+JUMP_SLICES = 64
+JUMP_ITERATIONS = 30
+
+
+def bisect_jump_time(tween, value, b, c, d, slices=JUMP_SLICES,
+        iterations=JUMP_ITERATIONS):
+    """
+    Return the first time the tween reaches value, for any curve
+
+    The duration is scanned in slices for the first one the curve crosses
+    value in, which is then bisected. If the curve never reaches value, the
+    time it comes closest is returned.
+    """
+    time_slice = d / slices
     lower = 0
-    upper = d
-    while iter < max_iter:
-        t = (upper - lower) / 2
-        if tween(t, b, c, d) - value < resolution:
-            return t
+    lower_diff = tween(0, b, c, d) - value
+    if lower_diff == 0:
+        return 0
+    closest = (abs(lower_diff), 0)
+    for i in range(1, slices + 1):
+        upper = i * time_slice
+        upper_diff = tween(upper, b, c, d) - value
+        if upper_diff == 0:
+            return upper
+        if (lower_diff < 0) != (upper_diff < 0):
+            break
+        closest = min(closest, (abs(upper_diff), upper))
+        lower, lower_diff = upper, upper_diff
+    else:
+        return closest[1]
+    for i in range(iterations):
+        middle = (lower + upper) / 2
+        middle_diff = tween(middle, b, c, d) - value
+        if (lower_diff < 0) != (middle_diff < 0):
+            upper = middle
         else:
-            upper = t
+            lower, lower_diff = middle, middle_diff
+    return (lower + upper) / 2
+
 
 def jump_time(tween, value, b, c, d):
+    """
+    Return the time at which the tween reaches value, so a segment can be
+    jumped to it
+    """
     if value == b:
         return 0
     if value == (b + c):
         return d
-    resolution = .01
-    time_slice = d * resolution
-    current_time = 0
-    accuracy = abs(c/200.0)
-    val_min = max(0, value - accuracy)
-    val_max = value + accuracy
-    for i in range(100):
-        temp_value = tween(current_time, b, c, d)
-        if val_max >= temp_value >= val_min:
-            # print "test value: %s, new time: %s" % (temp_value, current_time)
-            return current_time
-        current_time += time_slice
-    print current_time
-    print tween, value, b, c, d, time_slice, temp_value
-    print "min, max"
-    print val_min, val_max
-    raise ValueError('Unable to determine jump time')
+    inverse = INVERSES.get(tween)
+    if inverse is not None and c:
+        # the fraction of the change, clamped to the curve
+        fraction = min(1, max(0, (value - b) / c))
+        return min(1, max(0, inverse(fraction))) * d
+    if isinstance(tween, TweenTable):
+        tween = tween.tween
+    return bisect_jump_time(tween, value, b, c, d)
@@ -0,0 +1,141 @@
+class OrderedSet(object):
+    """
+    A set that keeps insertion order, with constant time membership tests,
+    adds and removals.
+
+    Items are kept in a list, so they iterate as fast as a list does. Removed
+    items are skipped by position, and dropped from the list when it is next
+    iterated, or once they outnumber the items still in the set.
+    """
+
+    def __init__(self, iterable=()):
+        self._items = []
+        # the position of each item in _items
+        self._index = {}
+        self._removed = 0
+        # removed items before this position have been skipped by first
+        self._head = 0
+        for item in iterable:
+            self.add(item)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, list(self))
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def __iter__(self):
+        if self._removed:
+            self._compact()
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _compact(self):
+        # a new list, so iterators already running keep their items
+        index = self._index
+        self._items = [item for position, item in enumerate(self._items)
+                if index.get(item) == position]
+        self._index = dict((item, position)
+                for position, item in enumerate(self._items))
+        self._removed = 0
+        self._head = 0
+
+    def add(self, item):
+        if item not in self._index:
+            self._index[item] = len(self._items)
+            self._items.append(item)
+
+    # list style names, for code written when these were lists
+    append = add
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    def discard(self, item):
+        if self._index.pop(item, None) is not None:
+            self._removed += 1
+            if self._removed > len(self._index):
+                self._compact()
+
+    def remove(self, item):
+        if item not in self._index:
+            raise KeyError(item)
+        self.discard(item)
+
+    def first(self, default=None):
+        """
+        The earliest added item still in the set
+        """
+        items = self._items
+        index = self._index
+        head = self._head
+        # items are only appended, so positions skipped once stay removed
+        while head < len(items) and index.get(items[head]) != head:
+            head += 1
+        self._head = head
+        if head < len(items):
+            return items[head]
+        return default
+
+    def clear(self):
+        self._items = []
+        self._index = {}
+        self._removed = 0
+        self._head = 0
+
+
+class NameIndex(object):
+    """
+    A case insensitive index of elements by name
+
+    Elements are indexed under the name they have when they are added, and
+    are found until they are discarded. Where elements share a name, the
+    first added is found.
+    """
+
+    def __init__(self):
+        # the handles of the elements with each name, in the order added
+        self._names = {}
+        # the name key and element for each handle
+        self._handles = {}
+
+    def __len__(self):
+        return len(self._handles)
+
+    def add(self, element, handle=None):
+        """
+        Index element, handle is what it is later discarded by, the element
+        itself by default
+        """
+        if handle is None:
+            handle = element
+        name = getattr(element, 'name', None)
+        if not name or handle in self._handles:
+            return
+        key = name.lower()
+        self._handles[handle] = (key, element)
+        if key not in self._names:
+            self._names[key] = OrderedSet()
+        self._names[key].add(handle)
+
+    def discard(self, handle):
+        if handle not in self._handles:
+            return
+        key, element = self._handles.pop(handle)
+        handles = self._names[key]
+        handles.discard(handle)
+        if not handles:
+            del self._names[key]
+
+    def get(self, name, default=None):
+        handles = self._names.get(name.lower())
+        if handles:
+            return self._handles[handles.first()][1]
+        return default
+
+    def clear(self):
+        self._names.clear()
+        self._handles.clear()
@@ -0,0 +1,17 @@
+"""
+A network for tests, rendering frames without sending them anywhere
+"""
+from birdfish.output.base import BaseNetwork
+
+
+class CaptureNetwork(BaseNetwork):
+    """
+    Keeps a copy of each frame sent
+    """
+
+    def __init__(self):
+        super(CaptureNetwork, self).__init__()
+        self.sent = []
+
+    def transmit(self):
+        self.sent.append(list(self.data))
@@ -146,3 +146,75 @@ def test_adsr_envelope():
 
 
 
+
+def test_compiled_adsr_matches_adsr():
+    import random
+    from birdfish import tween
+    random.seed(17)
+    shapes = [tween.LINEAR, tween.IN_QUAD, tween.OUT_CIRC, tween.OUT_ELASTIC]
+    settings = [
+        {},
+        dict(sustain_value=1.0, attack_duration=0),
+        dict(attack_shape=tween.IN_QUAD, decay_shape=tween.OUT_CIRC,
+            release_shape=tween.OUT_ELASTIC, release_duration=0),
+        dict(attack_duration=.05, decay_duration=0, sustain_value=.3,
+            release_shape=tween.IN_QUAD),
+        ]
+    for kwargs in settings:
+        tree = envelope.ADSREnvelope(**kwargs)
+        compiled = envelope.CompiledADSREnvelope(**kwargs)
+        for i in range(2000):
+            if random.random() < .05:
+                state = random.choice([0, 1])
+                force = random.random() < .2
+                tree.trigger(state=state, force=force)
+                compiled.trigger(state=state, force=force)
+            if tree.advancing:
+                delta = random.choice([.025, .01, .3])
+                assert tree.update(delta) == compiled.update(delta)
+            assert tree.advancing == compiled.advancing
+            assert tree.value == compiled.value
+            assert (tree.get_current_segment().label ==
+                    compiled.get_current_segment().label)
+            assert tree.attack_completed == compiled.attack_completed
+
+def test_compiled_adsr_copies_share_table():
+    from copy import deepcopy
+    e = envelope.CompiledADSREnvelope()
+    e.trigger(state=1)
+    e.update(.1)
+    copy = deepcopy(e)
+    assert copy.table is e.table
+    copy.update(.1)
+    assert e.value == .2
+    assert copy.value == .4
+
+def test_profiles_are_interned():
+    from copy import deepcopy
+    a = envelope.ADSREnvelope(attack_duration=.3)
+    b = envelope.ADSREnvelope(attack_duration=.3)
+    c = envelope.ADSREnvelope(attack_duration=.4)
+    assert a.attack_envelope.profile is b.attack_envelope.profile
+    assert a.release_envelope.profile is b.release_envelope.profile
+    assert a.attack_envelope.profile is not c.attack_envelope.profile
+    copy = deepcopy(a)
+    assert copy.attack_envelope is not a.attack_envelope
+    assert copy.attack_envelope.profile is a.attack_envelope.profile
+    compiled = envelope.CompiledADSREnvelope(attack_duration=.3)
+    other = envelope.CompiledADSREnvelope(attack_duration=.3)
+    assert compiled.table[0] is other.table[0]
+
+def test_private_profiles_are_copied():
+    from copy import deepcopy
+    segment = envelope.EnvelopeSegment(start=0, change=1.0, duration=1.0)
+    copy = deepcopy(segment)
+    assert copy.profile is not segment.profile
+    assert copy.profile.duration == 1.0
+
+def test_profile_registry_releases_unused():
+    registry = envelope.ProfileRegistry()
+    profile = registry.get(duration=.123)
+    assert registry.get(duration=.123) is profile
+    assert len(registry) == 1
+    del profile
+    assert len(registry) == 0
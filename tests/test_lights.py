@@ -0,0 +1,259 @@
+import ctypes
+
+from birdfish import tween
+from birdfish.envelope import CompiledADSREnvelope
+from birdfish.lights import (Chase, LightElement, LightGroup, LightShow,
+        PulseChase, RGBLight)
+from networks import CaptureNetwork
+
+
+def test_active_set():
+    show = LightShow()
+    lights = [LightElement(attack_duration=.1, release_duration=.1)
+            for i in range(3)]
+    for l in lights:
+        show.add_element(l)
+    show.step()
+    # idle elements leave the active set after their first update
+    assert len(show.active_elements) == 0
+    lights[1].trigger(1)
+    show.step(count=20, speed=0)
+    assert list(show.active_elements) == [lights[1]]
+    lights[1].trigger(0)
+    show.step(count=3, speed=0)
+    assert lights[1] in show.active_elements
+    show.step(count=3, speed=0)
+    assert lights[1].intensity == 0
+    assert len(show.active_elements) == 0
+
+
+def test_active_group_updates_children():
+    show = LightShow()
+    lights = [LightElement(attack_duration=.1, release_duration=.1)
+            for i in range(3)]
+    group = LightGroup(elements=lights)
+    show.add_element(group)
+    group.trigger(1)
+    show.step(count=20, speed=0)
+    assert list(show.active_elements) == [group]
+    assert all(l.intensity == .8 for l in lights)
+    group.trigger(0)
+    show.step(count=10, speed=0)
+    assert all(l.intensity == 0 for l in lights)
+    assert len(show.active_elements) == 0
+
+
+
+def test_child_trigger_activates_its_group():
+    show = LightShow()
+    lights = [LightElement(attack_duration=.1, release_duration=.1)
+            for i in range(3)]
+    group = LightGroup(elements=lights)
+    # nested in a chase, only the outer element is in the show
+    chase = Chase(elements=[group])
+    show.add_element(chase)
+    show.step(count=5, speed=0)
+    assert len(show.active_elements) == 0
+    lights[0].trigger(1)
+    show.step(count=10, speed=0)
+    assert lights[0].intensity > .5
+    assert lights[1].intensity == 0
+    lights[0].trigger(0)
+    show.step(count=10, speed=0)
+    assert lights[0].intensity == 0
+    assert len(show.active_elements) == 0
+
+
+def test_removed_element_is_not_activated():
+    show = LightShow()
+    light = LightElement()
+    show.add_element(light)
+    show.remove_element(light)
+    light.trigger(1)
+    show.step()
+    assert len(show.active_elements) == 0
+
+
+def _hit_pulse_frames(pooled):
+    import random
+    from birdfish.lights import HitPulse, RGBLight
+
+    class CopyingHitPulse(HitPulse):
+        def release(self, key, instance):
+            pass
+
+    random.seed(21)
+    show = LightShow()
+    network = CaptureNetwork()
+    show.networks.append(network)
+    lights = [RGBLight(start_channel=i * 3 + 1, attack_duration=.05,
+        release_duration=.05) for i in range(40)]
+    for l in lights:
+        network.add_element(l)
+    spawner = (HitPulse if pooled else CopyingHitPulse)(name='hits')
+    spawner.elements = lights
+    spawner.width = 4
+    spawner.show = show
+    spawner.network = network
+    show.add_element(spawner)
+    show.init_show()
+    frames = []
+    for i in range(120):
+        if i % 20 == 0:
+            spawner.trigger(1, key=(0, 10))
+        if i % 20 == 8:
+            spawner.trigger(0, key=(0, 10))
+        show.step(speed=0)
+        network.render()
+        frames.append(list(network.data))
+    return spawner, frames
+
+
+def test_spawner_pool_reuses_instances():
+    pooled, pooled_frames = _hit_pulse_frames(True)
+    copied, copied_frames = _hit_pulse_frames(False)
+    assert pooled_frames == copied_frames
+    assert any(any(f) for f in pooled_frames)
+    # the spent pair is back in the pool, ready for the next hit
+    assert len(pooled.pool[10]) == 1
+    pair = pooled.pool[10][0]
+    pooled.trigger(1, key=(0, 10))
+    assert pooled.spawned[10] is pair
+    assert not pooled.pool[10]
+
+
+def test_spawner_prewarm():
+    from birdfish.lights import Chase, Spawner
+    from birdfish.output.base import DefaultNetwork
+    chase = Chase(start_pos=0, end_pos=3, speed=.2)
+    chase.elements = [LightElement() for i in range(4)]
+    spawner = Spawner(model=chase, show=LightShow(), network=DefaultNetwork())
+    spawner.prewarm(3)
+    assert len(spawner.pool[None]) == 3
+    instance = spawner.pool[None][-1]
+    assert spawner.spawn(5) is instance
+    assert len(spawner.pool[None]) == 2
+
+
+class FullPulseChase(PulseChase):
+    # renders every element each frame, as before windowed rendering
+
+    def updated_elements(self):
+        return self.elements
+
+    def render(self):
+        self.set_current_nodes()
+        for i, e in enumerate(self.elements):
+            e.trigger(0)
+            if i in self.node_range:
+                e.trigger(self.nodes[i - self.node_range[0]])
+
+
+class SampledLight(LightElement):
+    # keeps the intensity of its last update, as the pulse's render triggers
+    # its elements again after they are updated
+
+    sample = 0
+
+    def update(self, show):
+        super(SampledLight, self).update(show)
+        self.sample = self.intensity
+
+
+def _pulse_chase_frames(chase_class, resolution, count=12, frames=200):
+    show = LightShow()
+    lights = [SampledLight(attack_duration=0, sustain_value=1,
+            release_duration=.2) for i in range(count)]
+    p = chase_class(name='pulse', start_pos=0, end_pos=count - 1, speed=3,
+            left_width=3, right_width=3, left_shape=tween.OUT_CIRC,
+            right_shape=tween.IN_QUAD)
+    p.kernel_resolution = resolution
+    p.elements = lights
+    show.add_element(p)
+    p.trigger(1)
+    result = []
+    for i in range(frames):
+        if i == 160:
+            p.trigger(0)
+        show.step(speed=0)
+        result.append([l.sample for l in lights])
+    return result
+
+
+def test_pulse_chase_windowed_render():
+    full = _pulse_chase_frames(FullPulseChase, None)
+    assert _pulse_chase_frames(PulseChase, None) == full
+    # kernels at the default resolution are within a step of exact
+    for frame, expected in zip(_pulse_chase_frames(PulseChase, 64), full):
+        assert all(abs(a - b) < .05 for a, b in zip(frame, expected))
+
+
+class FullChase(Chase):
+    # triggers every element each frame, as before incremental rendering
+
+    def updated_elements(self):
+        return self.elements
+
+    def _render_window(self, start, end, intensity):
+        [e.trigger(0) for e in self.elements]
+        [e.trigger(intensity) for e in self.elements[start:end]]
+
+
+class CountedLight(SampledLight):
+
+    triggers = 0
+
+    def trigger(self, intensity, **kwargs):
+        self.triggers += 1
+        super(CountedLight, self).trigger(intensity, **kwargs)
+
+
+def _window_chase_frames(chase_class, count=30, frames=200):
+    show = LightShow()
+    lights = [CountedLight(attack_duration=0, sustain_value=1,
+            release_duration=.2) for i in range(count)]
+    c = chase_class(name='chase', start_pos=0, end_pos=count, speed=2)
+    c.elements = lights
+    c.sweep = False
+    c.width = 3
+    c.continuation_mode = 'loop'
+    show.add_element(c)
+    c.trigger(1)
+    result = []
+    for i in range(frames):
+        if i == 150:
+            c.trigger(0)
+        elif i == 170:
+            c.trigger(1)
+        show.step(speed=0)
+        result.append([l.sample for l in lights])
+    return result, sum(l.triggers for l in lights)
+
+
+def test_chase_window_triggers_edges():
+    frames, triggers = _window_chase_frames(Chase)
+    full_frames, full_triggers = _window_chase_frames(FullChase)
+    # the old render reset the window every frame, so its lights released
+    # from 0 at the off trigger instead of from where they were held
+    assert frames[:150] == full_frames[:150]
+    assert frames[170:] == full_frames[170:]
+    assert any(any(frame) for frame in frames)
+    assert any(frames[151])
+    # the first render releases every element, then only the edges move
+    assert triggers < full_triggers // 10
+
+
+def _dict_allocated(obj):
+    # reading __dict__ would allocate it, look at the slot itself instead
+    offset = type(obj).__dictoffset__
+    assert offset > 0
+    return ctypes.c_void_p.from_address(id(obj) + offset).value is not None
+
+
+def test_default_light_allocates_no_dicts():
+    light = RGBLight()
+    for obj in (light.device, light.adsr_envelope, CompiledADSREnvelope()):
+        assert not _dict_allocated(obj)
+    # other attributes are still accepted, with a dict allocated for them
+    light.device.note = 'spare'
+    assert _dict_allocated(light.device)
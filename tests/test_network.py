@@ -0,0 +1,266 @@
+from birdfish.colors import generate_gamma_table
+from birdfish.lights import LightElement, RGBLight
+from birdfish.output.base import DefaultNetwork
+
+
+def make_network(*lights):
+    network = DefaultNetwork()
+    network.add_elements(lights)
+    network.init_data()
+    return network
+
+
+def test_render_quantizes_frame():
+    light = LightElement(start_channel=2)
+    network = make_network(light)
+    assert len(network.frame) == 2
+    light.set_intensity(.5)
+    network.render()
+    assert list(network.data) == [0, 127]
+    assert network.frame[1] == .5
+
+
+def test_render_highest_value_wins():
+    first = LightElement(start_channel=1)
+    second = LightElement(start_channel=1)
+    network = make_network(first, second)
+    first.set_intensity(.2)
+    second.set_intensity(.6)
+    network.render()
+    assert network.data[0] == 153
+    second.set_intensity(0)
+    network.render()
+    assert network.data[0] == 51
+
+
+def test_render_gamma_and_bit_depth():
+    light = RGBLight(start_channel=1)
+    light.hue = 0
+    light.saturation = 1
+    light.set_intensity(1.0)
+    light.update_rgb()
+    network = make_network(light)
+    network.gamma = generate_gamma_table()
+    network.render()
+    assert list(network.data) == [255, 0, 0]
+    network.gamma = None
+    network.bit_depth = 16
+    network.init_data()
+    network.render()
+    assert list(network.data) == [65535, 0, 0]
+
+
+def test_8_bit_gamma_at_16_bits():
+    light = LightElement(start_channel=1)
+    network = make_network(light)
+    gamma = generate_gamma_table()
+    network.gamma = gamma
+    network.bit_depth = 16
+    network.init_data()
+    light.set_intensity(.5)
+    network.render()
+    # the 8 bit table is scaled to 16 bits
+    assert network.data[0] == gamma[127] * 257
+    light.set_intensity(1.0)
+    network.render()
+    assert network.data[0] == 65535
+
+
+def test_quantize_only_written_channels():
+    lights = [LightElement(start_channel=i) for i in range(1, 11)]
+    network = make_network(*lights)
+    for i, light in enumerate(lights):
+        light.set_intensity(i / 10.0)
+    network.render()
+    full = list(network.data)
+    lights[3].set_intensity(1.0)
+    network.update_data()
+    assert network._dirty == set([3])
+    # a channel that was not written is copied, not converted again
+    network.frame[5] = 0
+    network.quantize()
+    assert list(network.data) == full[:3] + [255] + full[4:]
+
+
+
+def test_quantize_clamps_negative_values():
+    light = LightElement(start_channel=1)
+    network = make_network(light)
+    for gamma in (None, generate_gamma_table()):
+        network.gamma = gamma
+        for bit_depth in (8, 16):
+            network.bit_depth = bit_depth
+            network.init_data()
+            # as written by an envelope overshooting below 0
+            network.frame[0] = -.03
+            network.changed = True
+            network.quantize()
+            assert network.data[0] == 0
+
+def test_render_reuses_buffers():
+    light = LightElement(start_channel=1)
+    network = make_network(light)
+    frame = network.frame
+    buffers = set([id(network.data), id(network._back_data)])
+    light.set_intensity(1.0)
+    network.render()
+    complete = network.data
+    assert complete[0] == 255
+    light.set_intensity(0)
+    network.reset()
+    network.update_data()
+    # the last complete frame is untouched while the next is built
+    assert network.frame[0] == 0
+    assert network.data[0] == 255
+    network.quantize()
+    assert network.data[0] == 0
+    assert complete[0] == 255
+    assert network.frame is frame
+    assert set([id(network.data), id(network._back_data)]) == buffers
+
+
+def test_compiled_channel_map():
+    light = LightElement(start_channel=1)
+    network = make_network(light)
+    device = light.device
+    assert device.channel_offsets == (0,)
+    device.strobe = .5
+    device.patch(3, 'strobe')
+    assert device.channel_offsets == (0, 2)
+    assert device.channel_attributes == ('intensity', 'strobe')
+    light.set_intensity(1.0)
+    network.render()
+    assert list(network.data) == [255, 0, 127]
+
+
+def test_patch_maps_live_network():
+    light = LightElement(start_channel=1)
+    other = LightElement(start_channel=3)
+    network = make_network(light, other)
+    light.set_intensity(1.0)
+    other.set_intensity(1.0)
+    network.render()
+    assert list(network.data) == [255, 0, 255]
+    # move the intensity to the next channel, the old one is cleared
+    del light.device.channels[1]
+    light.device.patch(2, 'intensity')
+    network.render()
+    assert list(network.data) == [0, 255, 255]
+    # and onto a channel shared with another device, beyond the universe
+    light.device.patch(3, 'intensity')
+    light.device.patch(10, 'intensity')
+    other.set_intensity(.5)
+    network.render()
+    assert list(network.data) == [0, 255, 255] + [0] * 6 + [255]
+    network.remove_element(light)
+    assert not light.device._networks
+    light.device.patch(4, 'intensity')
+    network.render()
+    assert list(network.data) == [0, 0, 127] + [0] * 7
+
+
+def test_rgb_conversion_deferred_to_network():
+    light = RGBLight(start_channel=1)
+    network = make_network(light)
+    light.hue = 0
+    light.saturation = 1
+    light.set_intensity(1.0)
+    light.device.set_hsv(*light.get_hsv())
+    assert light.device.red == 0
+    network.render()
+    assert list(network.data) == [255, 0, 0]
+    assert light.device.rendered_hsv == (0, 1, 1.0)
+    light.normalize = True
+    light.set_intensity(.5)
+    light.update_rgb()
+    assert light.red == .25
+
+
+def test_only_changed_devices_are_written():
+    lights = [LightElement(start_channel=i) for i in (1, 2, 2)]
+    network = make_network(*lights)
+    written = []
+    for l in lights:
+        l.device.update_channels = (lambda d: lambda: written.append(d))(
+                l.device)
+    network.render()
+    assert len(written) == 3
+    del written[:]
+    network.render()
+    assert written == []
+    assert network.changed is False
+    lights[0].set_intensity(1.0)
+    network.render()
+    assert written == [lights[0].device]
+    assert list(network.data) == [255, 0]
+    # lowering one of two devices sharing a channel merges both again
+    lights[1].set_intensity(.6)
+    lights[2].set_intensity(.4)
+    network.render()
+    assert network.data[1] == 153
+    lights[1].set_intensity(0)
+    del written[:]
+    network.render()
+    assert set(written) == set([lights[1].device, lights[2].device])
+    assert network.data[1] == 102
+
+
+def test_gamma_leaves_held_devices_clean():
+    lights = [LightElement(start_channel=i) for i in range(1, 4)]
+    rgb = RGBLight(start_channel=4)
+    rgb.hue = 0
+    rgb.saturation = 1
+    network = make_network(rgb, *lights)
+    for l in lights:
+        l.device.gamma = generate_gamma_table()
+    generations = []
+    for frame in range(5):
+        for l in lights:
+            l.set_intensity(.5)
+        rgb.set_intensity(1.0)
+        rgb.update_rgb()
+        network.render()
+        generations.append([e.generation for e in network.elements])
+    # gamma is applied to the channel written, not to the device intensity
+    assert lights[0].device.intensity == .5
+    assert network.data[0] == generate_gamma_table()[127]
+    assert generations[1:] == generations[:1] * 4
+
+
+def test_removed_device_channels_are_cleared():
+    first = LightElement(start_channel=1)
+    second = LightElement(start_channel=2)
+    network = make_network(first, second)
+    first.set_intensity(1.0)
+    second.set_intensity(1.0)
+    network.render()
+    assert list(network.data) == [255, 255]
+    assert network.remove_element(second)
+    network.render()
+    assert list(network.data) == [255, 0]
+
+
+def test_named_elements():
+    from birdfish.lights import LightShow
+    show = LightShow()
+    network = DefaultNetwork()
+    show.networks.append(network)
+    light = LightElement(name='Front', start_channel=1)
+    other = LightElement(name='back', start_channel=2)
+    network.add_element(light)
+    network.add_element(other)
+    assert network.get_named_element('front') is light
+    assert show.get_named_element('FRONT') is light
+    assert show.get_named_element('Back') is other
+    assert show.get_named_element('missing') is False
+    # removed elements are not found, even after a cached lookup
+    network.remove_element(light)
+    assert network.get_named_element('front') is False
+    assert show.get_named_element('front') is False
+    # elements in the show are found before those only in networks
+    group = LightElement(name='front')
+    show.add_element(group)
+    network.add_element(light)
+    assert show.get_named_element('Front') is group
+    show.remove_element(group)
+    assert show.get_named_element('Front') is light
@@ -0,0 +1,93 @@
+import time
+
+from birdfish.lights import LightElement, LightShow, RGBLight
+from birdfish.offline import FileCapture, FrameCapture, OfflineRenderer
+from networks import CaptureNetwork
+
+
+def make_show():
+    show = LightShow()
+    network = CaptureNetwork()
+    light = LightElement(start_channel=1, attack_duration=.5,
+            release_duration=.5)
+    rgb = RGBLight(start_channel=2, attack_duration=.2)
+    rgb.hue = .5
+    rgb.saturation = 1
+    for l in (light, rgb):
+        show.add_element(l, network=network)
+    return show, network, light, rgb
+
+
+def test_offline_render_matches_step():
+    show, network, light, rgb = make_show()
+    renderer = OfflineRenderer(show)
+    renderer.schedule(.26, light.trigger, 1)
+    renderer.schedule(.26, rgb.trigger, 1)
+    renderer.schedule(1.01, light.trigger, 0)
+    start = time.time()
+    capture = renderer.render(60)
+    # a minute of show renders without waiting in real time
+    assert time.time() - start < 30
+    assert len(capture) == 60 * 40
+    assert not network.sent
+
+    expected, network, light, rgb = make_show()
+    expected.init_show()
+    frames = []
+    for i in range(60):
+        if i == 10:
+            light.trigger(1)
+            rgb.trigger(1)
+        elif i == 40:
+            light.trigger(0)
+        expected.step(speed=0)
+        frames.append([list(network.data)])
+    assert [map(list, capture.frame(i)) for i in range(60)] == frames
+    assert capture.timecodes[59] == expected.timecode
+
+
+def test_capture_diff_and_file(tmpdir):
+    show, network, light, rgb = make_show()
+    renderer = OfflineRenderer(show)
+    renderer.schedule(0, light.trigger, 1)
+    first = renderer.render(1)
+    show, network, light, rgb = make_show()
+    renderer = OfflineRenderer(show)
+    renderer.schedule(.5, light.trigger, 1)
+    second = renderer.render(1)
+    assert second.diff(first)[0] == 0
+    assert first.diff(first) == []
+
+    path = tmpdir.join('frames.dmx')
+    show, network, light, rgb = make_show()
+    renderer = OfflineRenderer(show)
+    renderer.schedule(0, light.trigger, 1)
+    with open(str(path), 'wb') as f:
+        capture = renderer.render(1, FileCapture(f, [network]))
+    assert capture.stride == 4
+    data = path.read_binary()
+    assert len(data) == 40 * 4
+    assert [ord(c) for c in data[-4:]] == list(first.frame(39)[0])
+
+
+class UnusedRenderer(object):
+
+    def start(self):
+        raise AssertionError("render workers started")
+
+    def update(self, timecode, time_delta):
+        raise AssertionError("render workers used")
+
+
+def test_offline_render_opens_no_output():
+    show, network, light, rgb = make_show()
+    show.output_threads = True
+    renderer = UnusedRenderer()
+    show.renderer = renderer
+    offline = OfflineRenderer(show)
+    offline.schedule(0, light.trigger, 1)
+    capture = offline.render(1)
+    assert show.senders == []
+    assert show.renderer is renderer
+    assert not network.sent
+    assert max(capture.frame(39)[0]) > 0
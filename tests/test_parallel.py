@@ -0,0 +1,42 @@
+from birdfish.lights import LightElement, LightShow, Chase
+from birdfish.parallel import ParallelRenderer
+from networks import CaptureNetwork
+
+
+def make_show():
+    show = LightShow()
+    lights = []
+    for universe in range(3):
+        network = CaptureNetwork()
+        for i in range(4):
+            light = LightElement(start_channel=i + 1, attack_duration=.1,
+                    release_duration=.1, name='light %s %s' % (universe, i))
+            show.add_element(light, network=network)
+            lights.append(light)
+    chase = Chase(name='chase', speed=2)
+    chase.elements = lights[4:8]
+    chase.end_pos = 4
+    show.add_element(chase)
+    return show
+
+
+def run(show, processes=None):
+    renderer = processes and ParallelRenderer(show, processes=processes)
+    show.renderer = renderer
+    show.init_show()
+    named = dict((e.name, e) for e in show.elements)
+    for name in ('light 0 1', 'light 2 3', 'chase'):
+        named[name].trigger(1)
+    show.step(count=10, speed=0)
+    named['light 0 1'].trigger(0)
+    show.step(count=10, speed=0)
+    if renderer:
+        renderer.stop()
+    return [n.sent for n in show.networks[1:]]
+
+
+def test_parallel_matches_serial():
+    serial = run(make_show())
+    parallel = run(make_show(), processes=2)
+    assert serial == parallel
+    assert any(any(frame) for frame in parallel[0])
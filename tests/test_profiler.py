@@ -0,0 +1,40 @@
+import json
+
+from birdfish.lights import LightElement, LightShow
+from birdfish.profiler import FrameProfiler
+
+
+def make_show(**kwargs):
+    show = LightShow()
+    show.profiler = FrameProfiler(**kwargs)
+    light = LightElement(start_channel=1, attack_duration=.1)
+    show.add_element(light, network=show.networks[0])
+    show.init_show()
+    light.trigger(1)
+    return show
+
+
+def test_profiler_records_phases():
+    show = make_show(frames=5)
+    show.step(count=8, speed=0)
+    profiler = show.profiler
+    # a ring buffer of the most recent frames
+    assert len(profiler.frames) == 5
+    assert [f['timecode'] for f in profiler.frames][-1] == show.timecode
+    phases = [name for name, start, end in profiler.frames[0]['phases']]
+    assert phases == ['engine', 'input', 'elements', 'effects',
+            'update_data', 'send_data']
+    assert set(profiler.summary()) == set(phases)
+
+
+def test_profiler_chrome_trace(tmpdir):
+    show = make_show(per_class=True)
+    show.step(count=3, speed=0)
+    path = str(tmpdir.join('trace.json'))
+    show.profiler.export(path)
+    events = json.load(open(path))['traceEvents']
+    assert len([e for e in events if e['name'] == 'frame']) == 3
+    classes = [e for e in events if e['cat'] == 'class']
+    assert classes[0]['name'] == 'LightElement'
+    assert classes[0]['args']['count'] == 1
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
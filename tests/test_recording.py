@@ -0,0 +1,100 @@
+import pytest
+
+from birdfish.lights import LightElement, LightShow
+from birdfish.offline import FrameCapture, OfflineRenderer
+from birdfish.recording import Player, Recorder
+import birdfish.recording
+from networks import CaptureNetwork
+
+
+class FakeClock(object):
+    now = 0
+
+    def __call__(self):
+        # every read moves time on, so waits finish
+        self.now += .01
+        return self.now
+
+
+def make_show():
+    show = LightShow()
+    networks = [CaptureNetwork(), CaptureNetwork()]
+    for i, network in enumerate(networks):
+        light = LightElement(start_channel=i + 1, attack_duration=.2)
+        show.add_element(light, network=network)
+        light.trigger(1)
+    return show, networks
+
+
+def record(path, frames=40):
+    show, networks = make_show()
+    renderer = OfflineRenderer(show)
+    recorder = Recorder(path, networks, show.frame_delay)
+    renderer.render(frames * show.frame_delay, recorder)
+    return recorder
+
+
+def test_record_and_play(tmpdir, monkeypatch):
+    path = str(tmpdir.join('show.bfdmx'))
+    # grow the file several times
+    monkeypatch.setattr(birdfish.recording, 'GROW_FRAMES', 16)
+    recorder = record(path)
+    expected = [list(recorder.timecodes)]
+    recorder.close()
+
+    networks = [CaptureNetwork(), CaptureNetwork()]
+    player = Player(path, networks)
+    assert len(player) == 40
+    assert [list(player.timecodes)] == expected
+    player.play(clock=FakeClock())
+    show, expected_networks = make_show()
+    capture = OfflineRenderer(show).render(1, FrameCapture(expected_networks))
+    for i in range(40):
+        assert [networks[0].sent[i], networks[1].sent[i]] == map(list,
+                capture.frame(i))
+    assert player.seek(.5) == 19
+    player.close()
+
+
+def test_unclosed_recording_is_readable(tmpdir):
+    path = str(tmpdir.join('crash.bfdmx'))
+    recorder = record(path, 10)
+    recorder.map.flush()
+    player = Player(path, [CaptureNetwork(), CaptureNetwork()])
+    assert list(player.timecodes) == list(recorder.timecodes)
+    player.load(9)
+    assert list(player.networks[1].data) == list(recorder.networks[1].data)
+    player.close()
+    recorder.close()
+
+
+def test_play_to_network_of_another_bit_depth(tmpdir):
+    path = str(tmpdir.join('deep.bfdmx'))
+    show, networks = make_show()
+    for network in networks:
+        network.bit_depth = 16
+    recorder = Recorder(path, networks, show.frame_delay)
+    OfflineRenderer(show).render(10 * show.frame_delay, recorder)
+    expected = list(networks[1].data)
+    recorder.close()
+    # same channel count, but 8 bit buffers
+    show, networks = make_show()
+    show.init_show()
+    player = Player(path, networks)
+    assert networks[1].data.itemsize == 2
+    player.load(9)
+    assert list(networks[1].data) == expected
+    player.close()
+
+
+def test_recorder_rejects_layout_change(tmpdir):
+    path = str(tmpdir.join('grown.bfdmx'))
+    show, networks = make_show()
+    show.init_show()
+    recorder = Recorder(path, networks, show.frame_delay)
+    recorder.add(0, networks)
+    networks[0].add_element(LightElement(start_channel=4))
+    with pytest.raises(ValueError):
+        recorder.add(show.frame_delay, networks)
+    assert len(recorder) == 1
+    recorder.close()
@@ -0,0 +1,67 @@
+from birdfish.scheduler import (FrameScheduler, JitterHistogram, monotonic,
+        wait_until)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadlines_do_not_drift():
+    clock = FakeClock()
+    scheduler = FrameScheduler(frame_rate=40, clock=clock)
+    for i in range(1000):
+        deadline = scheduler.next_frame()
+        # time spent rendering does not push later frames back
+        clock.now = deadline - .001
+    assert scheduler.deadline == 100 + 1000 / 40.0
+    assert scheduler.timecode == 25
+
+
+def test_overrun_skips_frames():
+    clock = FakeClock()
+    scheduler = FrameScheduler(frame_rate=10, clock=clock)
+    scheduler.next_frame()
+    # a slow frame takes three frame periods
+    clock.now += .35
+    deadline = scheduler.next_frame()
+    assert scheduler.histogram.overruns == 2
+    assert deadline > clock.now
+
+
+def test_wait_until_is_not_early():
+    deadline = monotonic() + .01
+    lateness = wait_until(deadline)
+    assert monotonic() >= deadline
+    assert 0 <= lateness < .01
+
+
+def test_histogram():
+    histogram = JitterHistogram()
+    for lateness in [.00005] * 98 + [.003, .2]:
+        histogram.record(lateness)
+    assert histogram.counts[0] == 98
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(50) == .0001
+    assert histogram.percentile(99) == .005
+    assert histogram.max == .2
+    assert 'overruns' in str(histogram)
+
+
+def test_histogram_merge():
+    first = JitterHistogram()
+    second = JitterHistogram()
+    for lateness in [.00005] * 10:
+        first.record(lateness)
+    second.record(.2)
+    second.overruns = 3
+    first.merge(second)
+    assert first.total == 11
+    assert first.counts[0] == 10
+    assert first.counts[-1] == 1
+    assert first.max == .2
+    assert first.overruns == 3
+    assert first.percentile(99) == .2
@@ -0,0 +1,72 @@
+import time
+
+from birdfish.lights import LightElement, LightShow
+from birdfish.output.sender import OutputSender
+from birdfish.scheduler import monotonic
+from networks import CaptureNetwork
+
+
+class SlowNetwork(CaptureNetwork):
+    def __init__(self, delay):
+        super(SlowNetwork, self).__init__()
+        self.delay = delay
+        self.sent_times = []
+
+    def transmit(self):
+        time.sleep(self.delay)
+        self.sent_times.append(monotonic())
+        super(SlowNetwork, self).transmit()
+
+
+def test_sender_waits_for_deadline():
+    network = SlowNetwork(0)
+    sender = OutputSender(network)
+    sender.start()
+    deadline = monotonic() + .05
+    sender.send(deadline)
+    sender.wait()
+    assert network.sent_times[0] >= deadline
+    sender.stop()
+    assert sender.sent == 1
+
+
+def test_show_renders_while_sending():
+    show = LightShow()
+    show.output_threads = True
+    network = SlowNetwork(.05)
+    light = LightElement(start_channel=1)
+    show.add_element(light, network=network)
+    show.init_show()
+    start = time.time()
+    light.set_intensity(1)
+    show.send_data()
+    # the slow transmit does not hold up the render loop
+    assert time.time() - start < .05
+    show.update()
+    light.set_intensity(.5)
+    show.send_data()
+    for sender in show.senders:
+        sender.stop()
+    assert network.sent == [[255], [127]]
+
+
+def test_show_reports_sender_jitter():
+    show = LightShow()
+    show.output_threads = True
+    networks = [SlowNetwork(0), SlowNetwork(0)]
+    for i, network in enumerate(networks):
+        show.add_element(LightElement(start_channel=1), network=network)
+    show.init_show()
+    show.scheduler.histogram.overruns = 2
+    for i in range(3):
+        show.update()
+        show.send_data(deadline=monotonic())
+    for sender in show.senders:
+        sender.wait()
+    # frames are sent by the senders, not waited for by the scheduler
+    assert show.scheduler.histogram.total == 0
+    histogram = show.jitter_histogram()
+    assert histogram.total == sum(s.sent for s in show.senders) >= 6
+    assert histogram.overruns == 2
+    for sender in show.senders:
+        sender.stop()
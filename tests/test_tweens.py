@@ -10,3 +10,69 @@ def test_tween_jump():
     val = tween.jump_time(tween_t, target, b, c, d)
     assert int(val) == 3
 
+
+
+def test_tween_tables():
+    for func in (tween.OUT_EXPO, tween.IN_CIRC, tween.OUT_BOUNCE,
+            tween.IN_OUT_BACK, tween.OUT_IN_QUAD):
+        lut = tween.table(func)
+        assert tween.table(func) is lut
+        for i in range(101):
+            t = i * .03
+            assert abs(lut(t, .2, .7, 3) - func(t, .2, .7, 3)) < .001
+        assert round(lut(3, .2, .7, 3), 9) == round(func(3, .2, .7, 3), 9)
+
+
+def test_change_dependent_table():
+    lut = tween.table(tween.OUT_ELASTIC)
+    for c in (1, -1, 2.5, .3):
+        for i in range(21):
+            t = i * .05
+            assert abs(lut(t, 0, c, 1) - tween.OUT_ELASTIC(t, 0, c, 1)) < .001
+
+
+def test_envelope_profile_uses_table():
+    from birdfish.envelope import EnvelopeProfile
+    profile = EnvelopeProfile(tween=tween.OUT_ELASTIC, duration=2)
+    assert profile.tween is tween.OUT_ELASTIC
+    assert profile._curve == tween.table(tween.OUT_ELASTIC).evaluate
+    assert abs(profile.get_value(.7) - tween.OUT_ELASTIC(.7, 0, 1, 2)) < .001
+    profile.tween = tween.LINEAR
+    assert profile._curve is tween.LINEAR
+
+
+def test_jump_time_inverses():
+    for func in tween.INVERSES:
+        for value in (.05, .3, .5, .77, .79):
+            # a release style curve, falling from .8
+            t = tween.jump_time(func, value, .8, -.8, 2)
+            assert 0 <= t <= 2
+            assert abs(func(t, .8, -.8, 2) - value) < 1e-6
+
+
+def test_jump_time_bisection():
+    for func in (tween.OUT_BOUNCE, tween.IN_OUT_QUAD, tween.IN_OUT_BACK,
+            tween.OUT_ELASTIC):
+        for value in (.1, .5, .9):
+            t = tween.jump_time(func, value, 0, 1, 1.5)
+            assert abs(func(t, 0, 1, 1.5) - value) < 1e-6
+            # the first time the value is reached
+            assert all(func(i * t / 50, 0, 1, 1.5) < value for i in range(50))
+
+
+def test_jump_time_unreachable_value():
+    # OUT_BACK overshoots to about 1.1, it never reaches 1.5
+    t = tween.jump_time(tween.OUT_BACK, 1.5, 0, 1, 1)
+    assert 0 < t < 1
+
+
+def test_profile_caches_jump_time():
+    from birdfish.envelope import EnvelopeProfile
+    profile = EnvelopeProfile(tween=tween.OUT_BOUNCE, start=.8, change=-.8)
+    t = profile.get_jump_time(.4)
+    assert abs(tween.OUT_BOUNCE(t, .8, -.8, 1) - .4) < .001
+    assert len(profile._jump_times) == 1
+    assert profile.get_jump_time(.40001) == t
+    assert len(profile._jump_times) == 1
+    profile.change = -.5
+    assert profile.get_jump_time(.4) != t
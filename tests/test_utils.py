@@ -0,0 +1,77 @@
+from birdfish.utils import NameIndex, OrderedSet
+
+
+def test_ordered_set_keeps_order():
+    s = OrderedSet([3, 1, 2, 1])
+    assert list(s) == [3, 1, 2]
+    s.discard(1)
+    s.add(1)
+    s.add(4)
+    assert list(s) == [3, 2, 1, 4]
+    assert len(s) == 4
+    assert 2 in s
+    s.remove(2)
+    assert 2 not in s
+    assert list(s) == [3, 1, 4]
+
+
+def test_ordered_set_removal_during_iteration():
+    s = OrderedSet(range(5))
+    seen = []
+    for item in s:
+        seen.append(item)
+        s.discard(item + 1)
+    # an iteration already running sees the items as they were
+    assert seen == range(5)
+    assert list(s) == [0]
+
+
+def test_ordered_set_compacts_removed_items():
+    s = OrderedSet()
+    for i in range(100):
+        s.add(i)
+        s.discard(i)
+    assert len(s._items) <= 1
+    assert list(s) == []
+
+
+def test_ordered_set_first():
+    s = OrderedSet(range(5))
+    assert s.first() == 0
+    s.discard(0)
+    s.discard(2)
+    assert s.first() == 1
+    s.discard(1)
+    s.add(0)
+    assert s.first() == 3
+    s.discard(3)
+    s.discard(4)
+    assert s.first() == 0
+    s.discard(0)
+    assert s.first('empty') == 'empty'
+
+
+class Named(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+def test_name_index_shared_names():
+    index = NameIndex()
+    elements = [Named('unamed_LightElements') for i in range(2000)]
+    for e in elements:
+        index.add(e)
+    assert index.get('UNAMED_lightelements') is elements[0]
+    # elements sharing a name are kept in a set each, not a list, so removing
+    # them in any order stays linear
+    for e in reversed(elements[1:]):
+        index.discard(e)
+    assert len(index._names['unamed_lightelements']._items) < 10
+    assert index.get('unamed_lightelements') is elements[0]
+    index.add(elements[1])
+    index.discard(elements[0])
+    assert index.get('unamed_lightelements') is elements[1]
+    index.discard(elements[1])
+    assert index.get('unamed_lightelements') is None
+    assert len(index) == 0